@@ -0,0 +1 @@
+"""Benchmarks of the organizer on deterministic synthetic file trees"""
@@ -0,0 +1,199 @@
+import os
+import io
+import json
+import random
+import time
+
+# Extension -> relative weight of the default file mix
+DEFAULT_EXTENSIONS = {
+    ".jpg": 20, ".png": 8, ".pdf": 12, ".docx": 8, ".txt": 10, ".csv": 5,
+    ".xlsx": 4, ".mp3": 5, ".mp4": 4, ".zip": 5, ".py": 6, ".html": 3,
+    ".log": 5, "": 2, ".dat": 3
+}
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp"}
+TEXT_EXTENSIONS = {".txt", ".csv", ".py", ".html", ".log", ".css", ".js"}
+
+# Modification times are spread over the two years before this date
+MTIME_END = 1767225600  # 2026-01-01 UTC
+MTIME_SPAN = 2 * 365 * 24 * 3600
+
+_WORDS = ("report invoice meeting data project summary chapter section class def import "
+          "function total amount client budget draft final notes review").split()
+
+
+def parse_extensions(text):
+    """Parse "jpg:3,pdf:2,txt" into {".jpg": 3, ".pdf": 2, ".txt": 1}"""
+    extensions = {}
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, weight = item.partition(":")
+        name = name.strip()
+        if name and not name.startswith("."):
+            name = "." + name
+        extensions[name] = float(weight) if weight else 1.0
+    return extensions
+
+
+class TreeSpec:
+    """Parameters of a synthetic file tree.
+
+    Sizes follow a log-normal distribution around median_size bytes,
+    clipped to [min_size, max_size]. duplicate_ratio is the share of files
+    that are byte-for-byte copies of an earlier file; depth and
+    folders_per_level shape the folder hierarchy. The same spec and seed
+    always produce the same tree.
+    """
+
+    def __init__(self, file_count=1000, median_size=32 * 1024, size_sigma=1.5,
+                 min_size=0, max_size=64 * 1024 * 1024, duplicate_ratio=0.1,
+                 extensions=None, depth=2, folders_per_level=4, seed=0):
+        self.file_count = file_count
+        self.median_size = median_size
+        self.size_sigma = size_sigma
+        self.min_size = min_size
+        self.max_size = max_size
+        self.duplicate_ratio = duplicate_ratio
+        self.extensions = dict(extensions or DEFAULT_EXTENSIONS)
+        self.depth = depth
+        self.folders_per_level = folders_per_level
+        self.seed = seed
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+def _folders(spec):
+    """Relative folder paths of the tree, the root ("") included"""
+    folders = [""]
+    level = [""]
+    for depth in range(spec.depth):
+        next_level = []
+        for parent in level:
+            for i in range(spec.folders_per_level):
+                next_level.append(os.path.join(parent, f"dir{depth}_{i}"))
+        folders.extend(next_level)
+        level = next_level
+    return folders
+
+
+def _size(spec, rng):
+    size = int(rng.lognormvariate(0, spec.size_sigma) * spec.median_size)
+    return max(spec.min_size, min(spec.max_size, size))
+
+
+def _text_content(rng, size):
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words).encode()[:size]
+
+
+def _image_content(rng, extension):
+    from PIL import Image
+    width, height = rng.choice((64, 96, 128)), rng.choice((64, 96, 128))
+    base = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+    img = Image.new("RGB", (width, height), base)
+    # A few deterministic rectangles so images differ visually
+    for _ in range(4):
+        x, y = rng.randrange(width // 2), rng.randrange(height // 2)
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        img.paste(color, (x, y, x + width // 3, y + height // 3))
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG" if extension == ".png" else "JPEG")
+    return buffer.getvalue()
+
+
+def _binary_content(rng, size, index):
+    # A random 4 KB block repeated, with the file index up front so files of
+    # equal size still differ
+    if not size:
+        return b""
+    block_size = min(size, 4096)
+    block = rng.getrandbits(block_size * 8).to_bytes(block_size, "little")
+    header = f"{index:012d}".encode()
+    data = (block * (size // len(block) + 1))[:size]
+    return (header + data[len(header):])[:size]
+
+
+def generate_tree(root, spec=None):
+    """Write a synthetic tree under root and return a manifest dict.
+
+    The manifest lists the spec, the file, byte and duplicate counts and
+    the bytes per extension. Images are small valid JPEG/PNG files so
+    image features and perceptual hashes work on them; their size does
+    not follow the size distribution.
+    """
+    spec = spec or TreeSpec()
+    rng = random.Random(spec.seed)
+    os.makedirs(root, exist_ok=True)
+
+    folders = _folders(spec)
+    for folder in folders[1:]:
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+    extensions = list(spec.extensions)
+    weights = [spec.extensions[ext] for ext in extensions]
+    originals = []
+    manifest = {"spec": spec.to_dict(), "files": 0, "bytes": 0, "duplicates": 0, "by_extension": {}}
+
+    for index in range(spec.file_count):
+        folder = rng.choice(folders)
+        if originals and rng.random() < spec.duplicate_ratio:
+            source_ext, content = rng.choice(originals)
+            extension = source_ext
+            manifest["duplicates"] += 1
+        else:
+            extension = rng.choices(extensions, weights)[0]
+            if extension in IMAGE_EXTENSIONS:
+                content = _image_content(rng, extension)
+            elif extension in TEXT_EXTENSIONS:
+                content = _text_content(rng, _size(spec, rng))
+            else:
+                content = _binary_content(rng, _size(spec, rng), index)
+            # Keep a bounded sample of originals to copy duplicates from
+            if len(originals) < 1000:
+                originals.append((extension, content))
+            elif rng.random() < 0.01:
+                originals[rng.randrange(len(originals))] = (extension, content)
+
+        path = os.path.join(root, folder, f"file_{index:07d}{extension}")
+        with open(path, "wb") as f:
+            f.write(content)
+        mtime = MTIME_END - rng.randrange(MTIME_SPAN)
+        os.utime(path, (mtime, mtime))
+
+        manifest["files"] += 1
+        manifest["bytes"] += len(content)
+        entry = manifest["by_extension"].setdefault(extension or "(none)", {"files": 0, "bytes": 0})
+        entry["files"] += 1
+        entry["bytes"] += len(content)
+
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic file tree")
+    parser.add_argument("root")
+    parser.add_argument("--files", type=int, default=1000)
+    parser.add_argument("--median-size", type=int, default=32 * 1024)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--extensions", help='Extension mix, e.g. "jpg:3,pdf:2,txt"')
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = generate_tree(args.root, TreeSpec(
+        file_count=args.files, median_size=args.median_size, duplicate_ratio=args.duplicate_ratio,
+        depth=args.depth, seed=args.seed,
+        extensions=parse_extensions(args.extensions) if args.extensions else None
+    ))
+    manifest["seconds"] = time.perf_counter() - start
+    print(json.dumps(manifest, indent=2))
@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.utils import hashing
+
+
+def _write_data(folder, large_size, small_files, small_size):
+    """Write one large file and small_files small ones of random data"""
+    large_path = os.path.join(folder, "large.bin")
+    block = os.urandom(1024 * 1024)
+    with open(large_path, "wb") as f:
+        for offset in range(0, large_size, len(block)):
+            f.write(block[:large_size - offset])
+    small_paths = []
+    for i in range(small_files):
+        path = os.path.join(folder, f"small_{i:06d}.bin")
+        with open(path, "wb") as f:
+            f.write(os.urandom(small_size))
+        small_paths.append(path)
+    return large_path, small_paths
+
+
+def _measure(function, size, repeat):
+    """Best GB/s of repeat runs"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return size / (1024 ** 3) / best if best > 0 else None
+
+
+def run(backends=None, large_size=256 * 1024 * 1024, small_files=2000, small_size=256 * 1024,
+        threads=None, repeat=3, work_dir=None):
+    """Measure hashing throughput in GB/s per backend.
+
+    Files are read once first so every backend hashes from the page cache
+    and the numbers compare hash speed, not disk speed.
+    """
+    backends = backends or hashing.available_backends()
+    threads = threads or max(os.cpu_count() or 1, 2)
+    folder = tempfile.mkdtemp(prefix="organizer_hash_bench_", dir=work_dir)
+    try:
+        large_path, small_paths = _write_data(folder, large_size, small_files, small_size)
+        small_total = small_files * small_size
+        hashing.hash_files([large_path] + small_paths, "md5", workers=1)
+
+        results = []
+        for backend in backends:
+            result = {
+                "backend": backend,
+                "large_mmap_gb_per_second": _measure(
+                    lambda: hashing.hash_file(large_path, backend, use_mmap=True), large_size, repeat),
+                "large_read_gb_per_second": _measure(
+                    lambda: hashing.hash_file(large_path, backend, use_mmap=False), large_size, repeat),
+                "small_files_gb_per_second": _measure(
+                    lambda: hashing.hash_files(small_paths, backend, workers=1), small_total, repeat),
+                f"small_files_{threads}_threads_gb_per_second": _measure(
+                    lambda: hashing.hash_files(small_paths, backend, workers=threads), small_total, repeat),
+            }
+            results.append(result)
+            print(f"{backend}: " + ", ".join(f"{key[:-len('_gb_per_second')]} {value:.2f} GB/s"
+                                             for key, value in result.items() if key != "backend"),
+                  file=sys.stderr)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+    return {
+        "cpu_count": os.cpu_count(),
+        "large_size": large_size,
+        "small_files": small_files,
+        "small_size": small_size,
+        "threads": threads,
+        "results": results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure file hashing throughput per backend")
+    parser.add_argument("--backends", help="Comma-separated backends (default: all available)")
+    parser.add_argument("--large-size", type=int, default=256 * 1024 * 1024, help="Size of the large file in bytes")
+    parser.add_argument("--small-files", type=int, default=2000, help="Number of small files")
+    parser.add_argument("--small-size", type=int, default=256 * 1024, help="Size of each small file in bytes")
+    parser.add_argument("--threads", type=int, help="Threads for the parallel run (default: CPU count)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; the best one counts")
+    parser.add_argument("--work-dir", help="Where to write the data (default: a temp folder)")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    backends = [name.strip() for name in args.backends.split(",")] if args.backends else None
+    unknown = [name for name in backends or () if name not in hashing.available_backends()]
+    if unknown:
+        parser.error(f"unavailable backends: {', '.join(unknown)}")
+
+    report = run(backends, args.large_size, args.small_files, args.small_size,
+                 args.threads, args.repeat, args.work_dir)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from benchmarks.generator import TreeSpec, generate_tree, parse_extensions
+
+ORGANIZATION_MODES = ("type", "date", "size", "ai")
+
+BENCHMARKS = tuple(f"organize_{mode}" for mode in ORGANIZATION_MODES) + (
+    "find_duplicates", "find_duplicates_warm", "cluster_files", "analytics_writer"
+)
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB, or None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _organize(tree, mode):
+    from src.core.organizer import SmartOrganizer
+    organizer = SmartOrganizer()
+    start = time.perf_counter()
+    stats = organizer.organize_folder(tree, organization_mode=mode, include_subfolders=True,
+                                      preserve_structure=False)
+    return time.perf_counter() - start, stats
+
+
+def _find_duplicates(tree, runs):
+    from src.core.duplicates import DuplicateDetector
+    from src.utils.hash_index import HashIndex
+    detector = DuplicateDetector(hash_index=HashIndex("file_organizer.db"))
+    # Earlier runs fill the hash index; only the last run is timed
+    for _ in range(runs - 1):
+        detector.find_duplicates(tree)
+        detector.hash_index.flush()
+    start = time.perf_counter()
+    groups = detector.find_duplicates(tree)
+    seconds = time.perf_counter() - start
+    return seconds, {"groups": len(groups), "stage_stats": detector.stage_stats}
+
+
+def _cluster_files(tree):
+    from src.ai.clustering import FileClustering
+    start = time.perf_counter()
+    clusters = FileClustering().cluster_files(tree)
+    return time.perf_counter() - start, {"clusters": len(clusters)}
+
+
+def _analytics_writer(files):
+    from datetime import datetime
+    from src.utils.analytics import Analytics
+    analytics = Analytics("file_organizer.db")
+    now = datetime.now()
+    start = time.perf_counter()
+    for i in range(files):
+        analytics.log_organization({
+            'path': f"/bench/documents/file_{i:07d}.pdf",
+            'name': f"file_{i:07d}.pdf",
+            'size': 1024 + i,
+            'modified': now
+        }, "documents")
+    analytics.flush()
+    return time.perf_counter() - start, {"rows": files}
+
+
+def run_benchmark(name, tree, manifest):
+    """Run one benchmark in the current process and return its result.
+
+    Meant to run in a fresh process so peak RSS belongs to this benchmark.
+    """
+    os.chdir(os.path.dirname(tree))
+    files, size = manifest["files"], manifest["bytes"]
+
+    if name.startswith("organize_"):
+        seconds, details = _organize(tree, name[len("organize_"):])
+        details = {key: value for key, value in details.items() if key != "run_id"}
+    elif name == "find_duplicates":
+        seconds, details = _find_duplicates(tree, runs=1)
+    elif name == "find_duplicates_warm":
+        seconds, details = _find_duplicates(tree, runs=2)
+    elif name == "cluster_files":
+        seconds, details = _cluster_files(tree)
+    elif name == "analytics_writer":
+        seconds, details = _analytics_writer(files)
+        size = None
+    else:
+        raise ValueError(f"Unknown benchmark: {name}")
+
+    return {
+        "name": name,
+        "files": files,
+        "bytes": size,
+        "seconds": seconds,
+        "files_per_second": files / seconds if seconds > 0 else None,
+        "mb_per_second": size / (1024 * 1024) / seconds if size is not None and seconds > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+        "details": details
+    }
+
+
+def run_suite(spec, names=BENCHMARKS, work_dir=None, keep=False):
+    """Generate the tree once, then run every benchmark on its own copy in
+    a fresh process. Returns the JSON-ready report."""
+    work_dir = work_dir or tempfile.mkdtemp(prefix="organizer_bench_")
+    template = os.path.join(work_dir, "template")
+
+    start = time.perf_counter()
+    manifest = generate_tree(template, spec)
+    manifest["seconds"] = time.perf_counter() - start
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    try:
+        for name in names:
+            bench_dir = os.path.join(work_dir, name)
+            tree = os.path.join(bench_dir, "tree")
+            shutil.copytree(template, tree)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_benchmark, name, tree, manifest).result()
+            results.append(result)
+            print(f"{name}: {result['files_per_second'] or 0:.0f} files/s, "
+                  f"{result['mb_per_second'] or 0:.1f} MB/s, "
+                  f"peak RSS {result['peak_rss_mb'] or 0:.0f} MB", file=sys.stderr)
+            if not keep:
+                shutil.rmtree(bench_dir, ignore_errors=True)
+    finally:
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "tree": manifest,
+        "results": results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the file organizer on a synthetic tree")
+    parser.add_argument("--files", type=int, default=5000, help="Number of files to generate")
+    parser.add_argument("--median-size", type=int, default=32 * 1024, help="Median file size in bytes")
+    parser.add_argument("--size-sigma", type=float, default=1.5, help="Log-normal size spread")
+    parser.add_argument("--max-size", type=int, default=64 * 1024 * 1024, help="Largest file in bytes")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1, help="Share of duplicate files")
+    parser.add_argument("--extensions", help='Extension mix, e.g. "jpg:3,pdf:2,txt"')
+    parser.add_argument("--depth", type=int, default=2, help="Folder nesting depth")
+    parser.add_argument("--folders-per-level", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--benchmarks", default=",".join(BENCHMARKS),
+                        help="Comma-separated benchmarks to run")
+    parser.add_argument("--work-dir", help="Where to generate trees (default: a temp folder)")
+    parser.add_argument("--keep", action="store_true", help="Keep generated trees")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.benchmarks.split(",") if name.strip()]
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    spec = TreeSpec(
+        file_count=args.files, median_size=args.median_size, size_sigma=args.size_sigma,
+        max_size=args.max_size, duplicate_ratio=args.duplicate_ratio,
+        extensions=parse_extensions(args.extensions) if args.extensions else None,
+        depth=args.depth, folders_per_level=args.folders_per_level, seed=args.seed
+    )
+    report = run_suite(spec, names, args.work_dir, args.keep)
+
+    text = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
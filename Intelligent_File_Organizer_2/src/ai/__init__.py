@@ -1,4 +1,8 @@
 from .classifier import FileClassifier
 from .clustering import FileClustering
+from .cache import LRUCache, ClassificationCache, ContentCache
+from .content import ContentExtractor, extract_text
+from .image_hash import NearDuplicateFinder
 
-__all__ = ['FileClassifier', 'FileClustering']
\ No newline at end of file
+__all__ = ['FileClassifier', 'FileClustering', 'LRUCache', 'ClassificationCache',
+           'ContentCache', 'NearDuplicateFinder', 'ContentExtractor', 'extract_text']
\ No newline at end of file
@@ -0,0 +1,183 @@
+import time
+import zlib
+import sqlite3
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Persistent cache keyed by content digest and a version, in SQLite.
+
+    Entries are stored per (digest, version), so bumping a version makes
+    all older entries miss; retain_versions() deletes them. The cache holds
+    at most max_entries rows and evicts the least recently used ones down
+    to 90% when it grows past that.
+
+    Subclasses name the table, its version column and its value columns
+    as (name, SQL type) pairs, and may override _encode/_decode to convert
+    values to and from their stored columns.
+    """
+
+    table = None
+    version_column = "version"
+    value_columns = ()
+    # What the entries are, for log messages
+    description = "cache entries"
+
+    def __init__(self, db_path="file_organizer.db", max_entries=200000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._init_db()
+        self._count = self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+    def _init_db(self):
+        """Initialize the cache table"""
+        values = "".join(f"{name} {sql_type},\n" for name, sql_type in self.value_columns)
+        cursor = self._conn.cursor()
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                digest TEXT,
+                {self.version_column} TEXT,
+                {values}
+                last_used REAL,
+                PRIMARY KEY (digest, {self.version_column})
+            )
+        ''')
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{self.table}_last_used
+            ON {self.table} (last_used)
+        ''')
+        self._conn.commit()
+
+    def _encode(self, values):
+        """Stored column values of an entry's values"""
+        return tuple(values)
+
+    def _decode(self, row):
+        """Entry value of its stored column values"""
+        return tuple(row)
+
+    def retain_versions(self, versions):
+        """Delete entries of versions that are no longer in use"""
+        placeholders = ", ".join("?" for _ in versions)
+        with self._lock:
+            cursor = self._conn.execute(
+                f'DELETE FROM {self.table} WHERE {self.version_column} NOT IN ({placeholders})',
+                list(versions)
+            )
+            self._conn.commit()
+            if cursor.rowcount:
+                self._count -= cursor.rowcount
+                logger.info(f"Invalidated {cursor.rowcount} {self.description}")
+
+    def get_many(self, digests, version):
+        """Return {digest: value} for cached digests"""
+        digests = [digest for digest in set(digests) if digest]
+        columns = ", ".join(name for name, _ in self.value_columns)
+        results = {}
+        with self._lock:
+            # Stay below SQLite's default limit on query parameters
+            for i in range(0, len(digests), 500):
+                chunk = digests[i:i + 500]
+                placeholders = ", ".join("?" for _ in chunk)
+                rows = self._conn.execute(f'''
+                    SELECT digest, {columns} FROM {self.table}
+                    WHERE {self.version_column} = ? AND digest IN ({placeholders})
+                ''', [version] + chunk).fetchall()
+                for row in rows:
+                    results[row[0]] = self._decode(row[1:])
+
+            if results:
+                now = time.time()
+                self._conn.executemany(f'''
+                    UPDATE {self.table} SET last_used = ?
+                    WHERE digest = ? AND {self.version_column} = ?
+                ''', [(now, digest, version) for digest in results])
+                self._conn.commit()
+            self.hits += len(results)
+            self.misses += len(digests) - len(results)
+        return results
+
+    def get(self, digest, version):
+        """Return the value cached for a digest, or None"""
+        return self.get_many([digest], version).get(digest)
+
+    def put_many(self, entries, version):
+        """Store (digest, *values) entries"""
+        now = time.time()
+        rows = [(entry[0], version) + self._encode(entry[1:]) + (now,)
+                for entry in entries if entry[0]]
+        if not rows:
+            return
+        names = [name for name, _ in self.value_columns]
+        columns = ", ".join(["digest", self.version_column] + names + ["last_used"])
+        placeholders = ", ".join("?" for _ in range(len(names) + 3))
+        with self._lock:
+            self._conn.executemany(f'''
+                INSERT OR REPLACE INTO {self.table} ({columns})
+                VALUES ({placeholders})
+            ''', rows)
+            self._count += len(rows)
+            if self._count > self.max_entries:
+                self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        """Drop least recently used rows down to 90% of max_entries"""
+        self._count = self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess <= 0:
+            return
+        self._conn.execute(f'''
+            DELETE FROM {self.table} WHERE rowid IN (
+                SELECT rowid FROM {self.table} ORDER BY last_used LIMIT ?
+            )
+        ''', (excess,))
+        self._count -= excess
+        logger.info(f"Evicted {excess} {self.description}")
+
+
+class ClassificationCache(LRUCache):
+    """Persistent cache of classification results keyed by content digest.
+
+    Values are (category, confidence) pairs, stored per model version.
+    """
+
+    table = "classification_cache"
+    version_column = "model_version"
+    value_columns = (("category", "TEXT"), ("confidence", "REAL"))
+    description = "cached classifications"
+
+    def __init__(self, db_path="file_organizer.db", max_entries=200000):
+        super().__init__(db_path, max_entries)
+
+    def put(self, digest, category, confidence, model_version):
+        """Store one result"""
+        self.put_many([(digest, category, confidence)], model_version)
+
+
+class ContentCache(LRUCache):
+    """Persistent cache of extracted file text keyed by content digest.
+
+    Values are texts, stored zlib-compressed per extractor version.
+    """
+
+    table = "content_cache"
+    version_column = "extractor_version"
+    value_columns = (("text", "BLOB"),)
+    description = "cached file texts"
+
+    def __init__(self, db_path="file_organizer.db", max_entries=50000):
+        super().__init__(db_path, max_entries)
+
+    def _encode(self, values):
+        return (zlib.compress(values[0].encode('utf-8')),)
+
+    def _decode(self, row):
+        return zlib.decompress(row[0]).decode('utf-8')
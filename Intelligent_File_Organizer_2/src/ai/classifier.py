@@ -1,67 +1,273 @@
 import os
+import re
+import time
+import threading
 import mimetypes
-import tensorflow as tf
-from tensorflow import keras
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from PIL import Image
-import cv2
-import nltk
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 import logging
+from ..utils.hash_index import get_hash_index
+from .content import DEFAULT_MAX_BYTES
 
-# Try to import structural_similarity
-try:
-    from skimage.metrics import structural_similarity as ssim
-    SSIM_AVAILABLE = True
-except ImportError:
-    SSIM_AVAILABLE = False
-    import warnings
-    warnings.warn("skimage not available, using basic image comparison")
+# TensorFlow, OpenCV, NLTK and scikit-learn are imported on first use, so
+# organizing without AI never pays for them
 
 logger = logging.getLogger(__name__)
 
+# MobileNetV2 input size
+IMAGE_SIZE = (224, 224)
+
+# Bump when the image model or the class -> category mapping changes, so
+# cached classifications are invalidated
+MODEL_VERSION = "mobilenet_v2-imagenet/1"
+
+# Keywords that make a text a category; the category with the most
+# distinct keywords wins if it has at least MIN_KEYWORD_HITS. Keywords
+# match whole words.
+CONTENT_KEYWORDS = {
+    "code": ['import', 'def', '#include', 'function(', 'self.', 'console.log', 'public static',
+             'return;', '};', '():'],
+    "finance": ['invoice', 'account number', 'account type', 'bank statement', 'balance', 'transaction',
+                'debit', 'credit', 'payment', 'income tax', 'tax payable', 'total income', 'amount', 'expense',
+                'gst', 'ifsc'],
+    "academic": ['university', 'semester', 'examination', 'marksheet', 'syllabus', 'internship',
+                 'student', 'grade', 'course', 'assignment'],
+    "documents": ['chapter', 'section', 'introduction', 'conclusion', 'abstract', 'references']
+}
+MIN_KEYWORD_HITS = 2
+
+# Categories that content analysis may refine
+REFINABLE_CATEGORIES = {"documents", "others"}
+
+
+def _keyword_pattern(keywords):
+    """One regex matching any of the keywords, as whole words where they
+    start or end with a word character"""
+    alternatives = []
+    for keyword in keywords:
+        pattern = re.escape(keyword)
+        if keyword[0].isalnum():
+            pattern = r'\b' + pattern
+        if keyword[-1].isalnum():
+            pattern += r'\b'
+        alternatives.append(pattern)
+    return re.compile("|".join(alternatives))
+
+
+_KEYWORD_PATTERNS = {category: _keyword_pattern(keywords) for category, keywords in CONTENT_KEYWORDS.items()}
+
+_image_model = None
+_image_model_loaded = False
+_nltk_ready = False
+_model_lock = threading.Lock()
+
+def get_image_model():
+    """Load the MobileNetV2 model once per process"""
+    global _image_model, _image_model_loaded
+    with _model_lock:
+        if not _image_model_loaded:
+            start = time.perf_counter()
+            try:
+                from tensorflow import keras
+                # Use MobileNetV2 for efficient image classification
+                _image_model = keras.applications.MobileNetV2(
+                    weights='imagenet',
+                    include_top=True
+                )
+                logger.info(f"Loaded image model in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                logger.warning(f"Could not load image model: {e}")
+                _image_model = None
+            _image_model_loaded = True
+        return _image_model
+
 class FileClassifier:
-    def __init__(self):
-        self.image_model = self._load_image_model()
-        self.text_vectorizer = TfidfVectorizer(max_features=1000)
-        self._setup_nltk()
+    def __init__(self, cache=None, extractor=None):
+        self._image_model = None
+        self._text_vectorizer = None
+        self.throughput = {"images": 0, "seconds": 0.0, "images_per_second": 0.0}
+        
+        # Optional ClassificationCache so already seen images skip inference
+        self.cache = cache
+        if self.cache is not None:
+            self.cache.retain_versions([MODEL_VERSION])
+        
+        # Optional ContentExtractor; without one analyze_content keeps the
+        # initial category
+        self.extractor = extractor
+    
+    @property
+    def image_model(self):
+        """Shared image model, loaded on first use"""
+        if self._image_model is None:
+            self._image_model = self._load_image_model()
+        return self._image_model
+    
+    @image_model.setter
+    def image_model(self, model):
+        self._image_model = model
+    
+    @property
+    def text_vectorizer(self):
+        """TF-IDF vectorizer, created on first use"""
+        if self._text_vectorizer is None:
+            from sklearn.feature_extraction.text import TfidfVectorizer
+            self._text_vectorizer = TfidfVectorizer(max_features=1000)
+            self._setup_nltk()
+        return self._text_vectorizer
     
     def _setup_nltk(self):
-        """Download required NLTK data"""
+        """Download required NLTK data, once per process"""
+        global _nltk_ready
+        if _nltk_ready:
+            return
         try:
+            import nltk
             nltk.download('punkt', quiet=True)
             nltk.download('stopwords', quiet=True)
         except:
             pass
+        _nltk_ready = True
     
     def _load_image_model(self):
         """Load pre-trained image classification model"""
+        return get_image_model()
+    
+    def _content_digest(self, file_path):
+        """Content hash used as the cache key, or None without a cache"""
+        if self.cache is None:
+            return None
         try:
-            # Use MobileNetV2 for efficient image classification
-            base_model = keras.applications.MobileNetV2(
-                weights='imagenet',
-                include_top=True
-            )
-            return base_model
-        except Exception as e:
-            logger.warning(f"Could not load image model: {e}")
+            return get_hash_index(self.cache.db_path).get_hash(file_path)
+        except OSError as e:
+            logger.warning(f"Could not hash {file_path}: {e}")
             return None
     
-    def classify_batch(self, file_paths):
-        """Classify multiple files using AI"""
-        classifications = []
+    def classify_batch(self, file_paths, batch_size=64, workers=4):
+        """Classify multiple files using AI.
+        
+        Images are decoded and resized on worker threads while the previous
+        batch runs through the model, and predicted batch_size at a time.
+        Other files are classified one by one with classify_file.
+        """
+        classifications = [None] * len(file_paths)
+        image_indices = []
         
-        for file_path in file_paths:
+        for i, file_path in enumerate(file_paths):
+            mime_type, _ = mimetypes.guess_type(file_path)
+            if mime_type and mime_type.startswith('image/'):
+                image_indices.append(i)
+                continue
             try:
-                classification = self.classify_file(file_path)
-                classifications.append(classification)
+                classifications[i] = self.classify_file(file_path)
             except Exception as e:
                 logger.error(f"Error classifying {file_path}: {e}")
-                classifications.append("others")
+                classifications[i] = "others"
+        
+        if self.cache is not None and image_indices:
+            # Reuse results for images whose content was classified before
+            digests = {i: self._content_digest(file_paths[i]) for i in image_indices}
+            cached = self.cache.get_many(digests.values(), MODEL_VERSION)
+            for i in image_indices:
+                if digests[i] in cached:
+                    classifications[i] = cached[digests[i]][0]
+            image_indices = [i for i in image_indices if classifications[i] is None]
+        
+        # The model is only loaded when some image was not classified before
+        if image_indices and not self.image_model:
+            for i in image_indices:
+                classifications[i] = "images"
+            image_indices = []
+        
+        if image_indices:
+            image_paths = [file_paths[i] for i in image_indices]
+            results = self._classify_image_batch(image_paths, batch_size, workers)
+            for i, (category, _) in zip(image_indices, results):
+                classifications[i] = category
+            
+            if self.cache is not None:
+                self.cache.put_many([
+                    (digests[i], category, confidence)
+                    for i, (category, confidence) in zip(image_indices, results)
+                    if confidence is not None
+                ], MODEL_VERSION)
         
         return classifications
     
+    def _classify_image_batch(self, image_paths, batch_size, workers):
+        """Classify images in batches with a prefetching decode pipeline.
+        
+        Returns a (category, confidence) pair per image; confidence is None
+        when the image could not be classified.
+        """
+        categories = []
+        start = time.perf_counter()
+        batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+        
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Keep the next batch decoding while the current one is predicted
+            pending = [[pool.submit(self._load_image, path) for path in batches[0]]]
+            for index in range(len(batches)):
+                if index + 1 < len(batches):
+                    pending.append([pool.submit(self._load_image, path) for path in batches[index + 1]])
+                arrays = [future.result() for future in pending.pop(0)]
+                categories.extend(self._predict_batch(arrays))
+        
+        elapsed = time.perf_counter() - start
+        self.throughput["images"] += len(image_paths)
+        self.throughput["seconds"] += elapsed
+        if self.throughput["seconds"] > 0:
+            self.throughput["images_per_second"] = self.throughput["images"] / self.throughput["seconds"]
+        logger.info(f"Classified {len(image_paths)} images at "
+                    f"{len(image_paths) / elapsed if elapsed > 0 else 0:.1f} images/s")
+        return categories
+    
+    def _load_image(self, image_path):
+        """Decode and resize one image to the model input, or None on failure"""
+        try:
+            img = Image.open(image_path)
+            # Let JPEG decoding downscale directly to about the model size
+            img.draft('RGB', IMAGE_SIZE)
+            img = img.convert('RGB').resize(IMAGE_SIZE)
+            return np.asarray(img, dtype=np.float32)
+        except Exception as e:
+            logger.warning(f"Could not load image {image_path}: {e}")
+            return None
+    
+    def _predict_batch(self, arrays):
+        """Run the model on decoded images and map predictions to
+        (category, confidence) pairs"""
+        valid = [i for i, array in enumerate(arrays) if array is not None]
+        categories = [("images", None)] * len(arrays)
+        if not valid:
+            return categories
+        
+        try:
+            from tensorflow import keras
+            batch = np.stack([arrays[i] for i in valid])
+            batch = keras.applications.mobilenet_v2.preprocess_input(batch)
+            predictions = self.image_model.predict(batch, batch_size=len(valid), verbose=0)
+            decoded = keras.applications.mobilenet_v2.decode_predictions(predictions, top=3)
+            for i, top in zip(valid, decoded):
+                categories[i] = (self._map_image_class(top[0][1]), float(top[0][2]))
+        except Exception as e:
+            logger.warning(f"Batch image classification failed: {e}")
+        return categories
+    
+    def _map_image_class(self, class_name):
+        """Map an ImageNet class to our categories"""
+        top_class = class_name.lower()
+        
+        if any(word in top_class for word in ['document', 'paper', 'text', 'book']):
+            return "documents"
+        elif any(word in top_class for word in ['diagram', 'chart', 'graph']):
+            return "documents"
+        elif any(word in top_class for word in ['screenshot', 'screen']):
+            return "screenshots"
+        else:
+            return "images"
+    
     def classify_file(self, file_path):
         """Classify a single file using AI"""
         mime_type, _ = mimetypes.guess_type(file_path)
@@ -95,13 +301,21 @@ class FileClassifier:
     
     def _classify_image(self, image_path):
         """Classify image using deep learning"""
+        digest = self._content_digest(image_path)
+        if digest is not None:
+            cached = self.cache.get(digest, MODEL_VERSION)
+            if cached is not None:
+                return cached[0]
+        
         if not self.image_model:
             return "images"
         
         try:
+            from tensorflow import keras
+            
             # Load and preprocess image
             img = Image.open(image_path).convert('RGB')
-            img = img.resize((224, 224))
+            img = img.resize(IMAGE_SIZE)
             img_array = keras.preprocessing.image.img_to_array(img)
             img_array = keras.applications.mobilenet_v2.preprocess_input(img_array)
             img_array = np.expand_dims(img_array, axis=0)
@@ -111,16 +325,10 @@ class FileClassifier:
             decoded = keras.applications.mobilenet_v2.decode_predictions(predictions, top=3)[0]
             
             # Map ImageNet classes to our categories
-            top_class = decoded[0][1].lower()
-            
-            if any(word in top_class for word in ['document', 'paper', 'text', 'book']):
-                return "documents"
-            elif any(word in top_class for word in ['diagram', 'chart', 'graph']):
-                return "documents"
-            elif any(word in top_class for word in ['screenshot', 'screen']):
-                return "screenshots"
-            else:
-                return "images"
+            category = self._map_image_class(decoded[0][1])
+            if digest is not None:
+                self.cache.put(digest, category, float(decoded[0][2]), MODEL_VERSION)
+            return category
             
         except Exception as e:
             logger.warning(f"Image classification failed: {e}")
@@ -128,29 +336,51 @@ class FileClassifier:
     
     def _classify_text(self, text_path):
         """Classify text files based on content"""
+        max_bytes = self.extractor.max_bytes if self.extractor is not None else DEFAULT_MAX_BYTES
         try:
             with open(text_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read(1000)  # Read first 1000 chars
-            
-            # Simple keyword-based classification
-            if any(keyword in content.lower() for keyword in ['import', 'function', 'class', 'def', 'var']):
-                return "code"
-            elif any(keyword in content.lower() for keyword in ['chapter', 'section', 'introduction', 'conclusion']):
-                return "documents"
-            else:
-                return "documents"
-        except:
+                content = f.read(max_bytes)
+        except OSError:
             return "documents"
+        return self._classify_content(content, "documents")
+    
+    def _classify_content(self, text, default):
+        """Category whose keywords the text has most, or default"""
+        if not text:
+            return default
+        text = text.lower()
+        best, best_hits = default, MIN_KEYWORD_HITS - 1
+        for category, pattern in _KEYWORD_PATTERNS.items():
+            hits = len(set(pattern.findall(text)))
+            if hits > best_hits:
+                best, best_hits = category, hits
+        return best
     
     def analyze_content(self, file_path, initial_category):
         """Deep content analysis for refined classification"""
-        # For now, return the initial category
-        # This can be expanded with more sophisticated analysis
-        return initial_category
+        return self.analyze_content_batch([file_path], [initial_category])[0]
+    
+    def analyze_content_batch(self, file_paths, initial_categories):
+        """Refine categories from the text of PDF, DOCX, XLSX and text files.
+        
+        Only files in REFINABLE_CATEGORIES are looked at. The text is
+        extracted by the ContentExtractor, in worker processes and cached by
+        content hash. Files without text keep their initial category.
+        """
+        categories = list(initial_categories)
+        if self.extractor is None:
+            return categories
+        indices = [i for i, category in enumerate(categories) if category in REFINABLE_CATEGORIES]
+        texts = self.extractor.extract_many([file_paths[i] for i in indices])
+        for i in indices:
+            categories[i] = self._classify_content(texts.get(file_paths[i]), categories[i])
+        return categories
     
     def compare_images(self, img1_path, img2_path):
         """Compare two images for similarity"""
         try:
+            import cv2
+            
             # Load images
             img1 = cv2.imread(img1_path)
             img2 = cv2.imread(img2_path)
@@ -168,7 +398,12 @@ class FileClassifier:
             gray1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
             gray2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
             
-            if SSIM_AVAILABLE:
+            try:
+                from skimage.metrics import structural_similarity as ssim
+            except ImportError:
+                ssim = None
+            
+            if ssim is not None:
                 # Calculate structural similarity
                 similarity = ssim(gray1, gray2)
             else:
@@ -0,0 +1,269 @@
+import os
+import re
+import time
+import zlib
+import zipfile
+import multiprocessing
+from collections import deque
+from xml.etree import ElementTree
+import logging
+from ..utils.hash_index import get_hash_index
+
+# Try to import pypdf for PDF text; without it only simple PDFs are read
+PDF_SUPPORT = False
+try:
+    import pypdf
+    PDF_SUPPORT = True
+except ImportError:
+    pypdf = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when extraction changes, so cached text is invalidated
+EXTRACTOR_VERSION = "text/1"
+
+# Text read per file
+DEFAULT_MAX_BYTES = 64 * 1024
+
+# Extensions read as plain text
+TEXT_EXTENSIONS = {'.txt', '.md', '.csv', '.log', '.json', '.xml', '.html', '.htm', '.rtf',
+                   '.py', '.js', '.css', '.c', '.h', '.cpp', '.java', '.php', '.rb', '.go'}
+
+_WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_SHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+
+_PDF_STREAM = re.compile(rb"stream\r?\n")
+# Literal strings shown with Tj, ' or " and inside TJ arrays
+_PDF_STRING = re.compile(rb"\((?:\\.|[^\\)])*\)")
+_PDF_ESCAPE = re.compile(rb"\\(?:([0-7]{1,3})|(.))", re.S)
+_PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f', b'\n': b''}
+
+
+def extract_text(file_path, max_bytes=DEFAULT_MAX_BYTES):
+    """First max_bytes of text of a PDF, DOCX, XLSX or plain text file.
+
+    Returns "" for other formats and raises OSError or ValueError for
+    files that cannot be read.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.pdf':
+        return _extract_pdf(file_path, max_bytes)
+    if ext == '.docx':
+        return _extract_docx(file_path, max_bytes)
+    if ext == '.xlsx':
+        return _extract_xlsx(file_path, max_bytes)
+    if ext in TEXT_EXTENSIONS:
+        with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+            return f.read(max_bytes)
+    return ""
+
+
+def _extract_pdf(file_path, max_bytes):
+    if not PDF_SUPPORT:
+        return _extract_pdf_strings(file_path, max_bytes)
+    try:
+        reader = pypdf.PdfReader(file_path)
+        if reader.is_encrypted:
+            # Statements are often encrypted with an empty user password
+            reader.decrypt("")
+        parts, size = [], 0
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            parts.append(text)
+            size += len(text)
+            if size >= max_bytes:
+                break
+        return "\n".join(parts)[:max_bytes]
+    except pypdf.errors.PyPdfError as e:
+        raise ValueError(f"Unreadable PDF: {e}") from e
+
+
+def _extract_pdf_strings(file_path, max_bytes):
+    """Literal text strings of the Flate-compressed content streams.
+
+    Misses text in encrypted files and fonts with custom encodings, which
+    needs pypdf.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read()
+    parts, size = [], 0
+    for match in _PDF_STREAM.finditer(data):
+        header = data[max(data.rfind(b" obj", 0, match.start()), match.start() - 1024):match.start()]
+        if b"/FlateDecode" not in header or b"/Image" in header:
+            continue
+        try:
+            content = zlib.decompressobj().decompress(data[match.end():match.end() + 4 * max_bytes])
+        except zlib.error:
+            continue
+        if b"BT" not in content:
+            continue
+        for string in _PDF_STRING.findall(content):
+            text = _unescape_pdf(string[1:-1]).decode('latin-1')
+            parts.append(text)
+            size += len(text)
+        if size >= max_bytes:
+            break
+    return "".join(parts)[:max_bytes]
+
+
+def _unescape_pdf(string):
+    return _PDF_ESCAPE.sub(lambda m: bytes([int(m.group(1), 8) & 0xFF]) if m.group(1)
+                           else _PDF_ESCAPES.get(m.group(2), m.group(2)), string)
+
+
+def _extract_docx(file_path, max_bytes):
+    """Paragraph text of word/document.xml"""
+    parts, size = [], 0
+    with zipfile.ZipFile(file_path) as archive, archive.open('word/document.xml') as f:
+        for event, element in ElementTree.iterparse(f):
+            if element.tag == _WORD_NS + 't' and element.text:
+                parts.append(element.text)
+                size += len(element.text)
+            elif element.tag == _WORD_NS + 'p':
+                parts.append("\n")
+                element.clear()
+            if size >= max_bytes:
+                break
+    return "".join(parts)[:max_bytes]
+
+
+def _extract_xlsx(file_path, max_bytes):
+    """Shared strings (the text cells) and the sheet names of a workbook"""
+    parts, size = [], 0
+    with zipfile.ZipFile(file_path) as archive:
+        names = set(archive.namelist())
+        if 'xl/workbook.xml' in names:
+            root = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+            parts.extend(sheet.get('name', '') for sheet in root.iter(_SHEET_NS + 'sheet'))
+        if 'xl/sharedStrings.xml' in names:
+            with archive.open('xl/sharedStrings.xml') as f:
+                for event, element in ElementTree.iterparse(f):
+                    if element.tag == _SHEET_NS + 'si':
+                        text = "".join(t.text or "" for t in element.iter(_SHEET_NS + 't'))
+                        parts.append(text)
+                        size += len(text)
+                        element.clear()
+                        if size >= max_bytes:
+                            break
+    return "\n".join(parts)[:max_bytes]
+
+
+def _extract_or_none(file_path, max_bytes):
+    """extract_text for the worker pool; None if the file is unreadable"""
+    try:
+        return extract_text(file_path, max_bytes)
+    except Exception as e:
+        logger.warning(f"Could not extract text from {file_path}: {e}")
+        return None
+
+
+def _ready(_):
+    return True
+
+
+class ContentExtractor:
+    """Extracts file text in a pool of worker processes.
+
+    Parsing a large or broken document can take long, so files are read
+    in separate processes, at most `workers` at a time, and a file that
+    takes longer than `timeout` seconds is given up on: the pool is
+    stopped and a new one takes the remaining files. Results are cached by
+    content hash when a ContentCache is given, so unchanged files are never
+    parsed twice, also after they are moved or renamed.
+    """
+
+    def __init__(self, cache=None, workers=2, timeout=10, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.timeouts = 0
+        self._pool = None
+        if self.cache is not None:
+            self.cache.retain_versions([EXTRACTOR_VERSION])
+
+    def supports(self, file_path):
+        """Whether extract_text reads this kind of file"""
+        ext = os.path.splitext(file_path)[1].lower()
+        return ext in ('.pdf', '.docx', '.xlsx') or ext in TEXT_EXTENSIONS
+
+    def extract(self, file_path):
+        """Text of one file, or None if it could not be read"""
+        return self.extract_many([file_path]).get(file_path)
+
+    def extract_many(self, file_paths):
+        """Return {path: text} for the supported files; text is None for
+        files that failed or timed out"""
+        file_paths = [path for path in dict.fromkeys(file_paths) if self.supports(path)]
+        results = {}
+        digests = {}
+        if self.cache is not None:
+            hash_index = get_hash_index(self.cache.db_path)
+            for path in file_paths:
+                try:
+                    digests[path] = hash_index.get_hash(path)
+                except OSError as e:
+                    logger.warning(f"Could not hash {path}: {e}")
+            cached = self.cache.get_many(digests.values(), EXTRACTOR_VERSION)
+            for path, digest in digests.items():
+                if digest in cached:
+                    results[path] = cached[digest]
+
+        todo = [path for path in file_paths if path not in results]
+        if todo:
+            start = time.perf_counter()
+            extracted = self._extract_in_pool(todo)
+            results.update(extracted)
+            logger.info(f"Extracted text of {len(todo)} files in {time.perf_counter() - start:.2f} s")
+            if self.cache is not None:
+                self.cache.put_many([(digests[path], text) for path, text in extracted.items()
+                                     if text is not None and path in digests], EXTRACTOR_VERSION)
+        return results
+
+    def _get_pool(self):
+        """The worker pool, started on first use"""
+        if self._pool is None:
+            # spawn keeps the workers free of the caller's threads (GUI, model)
+            self._pool = multiprocessing.get_context("spawn").Pool(self.workers)
+            # Wait for the workers to start, so their startup does not count
+            # against the first files' timeouts
+            self._pool.map(_ready, range(self.workers), chunksize=1)
+        return self._pool
+
+    def _extract_in_pool(self, file_paths):
+        results = {}
+        todo = deque(file_paths)
+        while todo:
+            pool = self._get_pool()
+            # No more files in flight than workers, so a file starts about
+            # when it is submitted and its deadline is fair
+            pending = deque()
+            while todo or pending:
+                while todo and len(pending) < self.workers:
+                    path = todo.popleft()
+                    pending.append((path, pool.apply_async(_extract_or_none, (path, self.max_bytes)),
+                                    time.monotonic() + self.timeout))
+                path, result, deadline = pending.popleft()
+                try:
+                    results[path] = result.get(max(0.0, deadline - time.monotonic()))
+                except multiprocessing.TimeoutError:
+                    logger.warning(f"Gave up extracting text from {path} after {self.timeout} s")
+                    results[path] = None
+                    self.timeouts += 1
+                    # The stuck worker can only be stopped with its pool;
+                    # files not done yet go to a new one
+                    for path, result, _ in pending:
+                        if result.ready():
+                            results[path] = result.get()
+                        else:
+                            todo.appendleft(path)
+                    self.close()
+                    break
+        return results
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
@@ -0,0 +1,175 @@
+import os
+import mimetypes
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+from ..utils.hash_index import get_hash_index
+from ..utils.scanner import scan_files
+
+logger = logging.getLogger(__name__)
+
+HASH_BITS = 64
+
+# DCT-II basis for the 32x32 pHash input
+_DCT_SIZE = 32
+_DCT_MATRIX = np.cos(
+    np.pi * np.outer(np.arange(_DCT_SIZE), 2 * np.arange(_DCT_SIZE) + 1) / (2 * _DCT_SIZE)
+)
+
+
+def _load_gray(image_path, size):
+    """Decode an image straight to a small grayscale array"""
+    img = Image.open(image_path)
+    img.draft('L', size)
+    img = img.convert('L').resize(size, Image.LANCZOS)
+    return np.asarray(img, dtype=np.float64)
+
+
+def _bits_to_int(bits):
+    value = 0
+    for bit in bits.flatten():
+        value = (value << 1) | int(bit)
+    return value
+
+
+def phash(image_path):
+    """64-bit DCT perceptual hash of an image"""
+    pixels = _load_gray(image_path, (_DCT_SIZE, _DCT_SIZE))
+    dct = _DCT_MATRIX @ pixels @ _DCT_MATRIX.T
+    low = dct[:8, :8].flatten()
+    # Skip the DC term when taking the median
+    return _bits_to_int(low > np.median(low[1:]))
+
+
+def dhash(image_path):
+    """64-bit difference hash of an image"""
+    pixels = _load_gray(image_path, (9, 8))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+HASH_FUNCTIONS = {"phash": phash, "dhash": dhash}
+
+
+def hamming_distance(hash1, hash2):
+    """Number of differing bits between two hashes"""
+    return bin(hash1 ^ hash2).count("1")
+
+
+class BKTree:
+    """BK-tree over integer hashes for Hamming radius queries"""
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, value, item):
+        """Add a hash with an attached item"""
+        node = [value, item, {}]
+        if self.root is None:
+            self.root = node
+            return
+        current = self.root
+        while True:
+            distance = hamming_distance(value, current[0])
+            child = current[2].get(distance)
+            if child is None:
+                current[2][distance] = node
+                return
+            current = child
+
+    def search(self, value, radius):
+        """Yield (distance, item) for hashes within radius of value"""
+        if self.root is None:
+            return
+        stack = [self.root]
+        while stack:
+            node_value, item, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= radius:
+                yield distance, item
+            # Triangle inequality: only these subtrees can hold matches
+            for child_distance, child in children.items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+
+
+class NearDuplicateFinder:
+    """Find visually similar images with perceptual hashes.
+
+    Each image is hashed once; hashes are kept in the shared hash index so
+    unchanged images are not decoded again on later scans. Pairs within
+    the Hamming radius implied by min_similarity are found with a BK-tree
+    instead of comparing every pair of images.
+    """
+
+    def __init__(self, min_similarity=0.85, algorithm="phash", hash_index=None, workers=4):
+        self.min_similarity = min_similarity
+        self.algorithm = algorithm
+        self.hash_function = HASH_FUNCTIONS[algorithm]
+        self.hash_index = hash_index or get_hash_index()
+        self.workers = workers
+
+    @property
+    def radius(self):
+        """Largest Hamming distance that still meets min_similarity"""
+        return int((1 - self.min_similarity) * HASH_BITS + 1e-9)
+
+    def get_image_hash(self, image_path, stat_result=None):
+        """Perceptual hash of an image, from the hash index if unchanged"""
+        st = stat_result or os.stat(image_path)
+        key = f"{self.algorithm}{HASH_BITS}"
+        digest = self.hash_index.lookup(st, key)
+        if digest is None:
+            digest = f"{self.hash_function(image_path):016x}"
+            self.hash_index.store(image_path, st, key, digest)
+        return int(digest, 16)
+
+    def _safe_hash(self, image_path, stat_result=None):
+        try:
+            return self.get_image_hash(image_path, stat_result)
+        except Exception as e:
+            logger.warning(f"Could not hash image {image_path}: {e}")
+            return None
+
+    def find_similar(self, image_paths, stats=None):
+        """Return (path1, path2, similarity) for all near-duplicate pairs.
+
+        stats optionally holds a stat result per path, from a scan.
+        """
+        stats = stats or [None] * len(image_paths)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            hashes = list(pool.map(self._safe_hash, image_paths, stats))
+
+        # Identical hashes share one tree node
+        by_hash = {}
+        for image_path, value in zip(image_paths, hashes):
+            if value is not None:
+                by_hash.setdefault(value, []).append(image_path)
+
+        pairs = []
+        radius = self.radius
+        tree = BKTree()
+        for value, paths in by_hash.items():
+            for i, path in enumerate(paths):
+                for other in paths[i + 1:]:
+                    pairs.append((path, other, 1.0))
+            for distance, other_paths in tree.search(value, radius):
+                similarity = 1 - distance / HASH_BITS
+                for path in paths:
+                    for other in other_paths:
+                        pairs.append((other, path, similarity))
+            tree.add(value, paths)
+
+        self.hash_index.flush()
+        return pairs
+
+    def find_in_folder(self, folder_path):
+        """Find near-duplicate image pairs under a folder"""
+        image_paths = []
+        stats = []
+        for record in scan_files(folder_path):
+            mime_type, _ = mimetypes.guess_type(record.path)
+            if mime_type and mime_type.startswith('image/'):
+                image_paths.append(record.path)
+                stats.append(record.stat)
+        return self.find_similar(image_paths, stats)
@@ -1,26 +1,104 @@
 import os
-import hashlib
 from collections import defaultdict
 import logging
+from ..utils.file_utils import generate_partial_hash
+from ..utils.hashing import hash_files, get_default_algorithm
+from ..utils.hash_index import get_hash_index
+from ..utils.scanner import scan_files
 
 logger = logging.getLogger(__name__)
 
 class DuplicateDetector:
-    def __init__(self):
-        self.hash_cache = {}
+    def __init__(self, hash_index=None, partial_block_size=65536, algorithm=None, workers=4):
+        self.hash_index = hash_index or get_hash_index()
+        self.partial_block_size = partial_block_size
+        self.algorithm = algorithm or get_default_algorithm()
+        self.workers = workers
+        self.stage_stats = {}
     
     def find_duplicates(self, folder_path):
-        """Find duplicate files in a folder"""
-        duplicates = defaultdict(list)
+        """Find duplicate files in a folder.
+        
+        Files are narrowed down in stages: grouped by size, then by a hash
+        of their first and last blocks, and only files that still collide
+        are hashed in full, on `workers` threads. Files no larger than two
+        blocks are read whole by the partial stage, whose digest is then
+        their full hash, so they never reach the full stage. Per-stage
+        counters are kept in stage_stats; "bytes_read" counts the bytes a
+        stage read and "skipped_bytes" the file bytes it avoided reading,
+        either because the file was ruled out or its digest was already
+        indexed.
+        """
+        self.stage_stats = {
+            "size": {"files": 0, "bytes": 0, "skipped_files": 0, "skipped_bytes": 0},
+            "partial": {"files": 0, "bytes_read": 0, "cached_files": 0,
+                        "skipped_files": 0, "skipped_bytes": 0},
+            "full": {"files": 0, "bytes_read": 0, "skipped_files": 0, "skipped_bytes": 0}
+        }
+        
+        # Stage 1: group by size
+        by_size = defaultdict(list)
+        for record in scan_files(folder_path):
+            by_size[record.stat.st_size].append((record.path, record.stat))
         
-        for root, _, files in os.walk(folder_path):
-            for filename in files:
-                file_path = os.path.join(root, filename)
+        candidates = []
+        size_stats = self.stage_stats["size"]
+        for size, entries in by_size.items():
+            size_stats["files"] += len(entries)
+            size_stats["bytes"] += size * len(entries)
+            if len(entries) > 1:
+                candidates.append(entries)
+            else:
+                size_stats["skipped_files"] += 1
+                size_stats["skipped_bytes"] += size
+        
+        # Stage 2: hash first and last blocks of size-colliding files
+        full_candidates = []
+        for entries in candidates:
+            by_partial = defaultdict(list)
+            for file_path, st in entries:
                 try:
-                    file_hash = self._get_file_hash(file_path)
-                    duplicates[file_hash].append(file_path)
+                    by_partial[self._get_partial_hash(file_path, st)].append((file_path, st))
                 except Exception as e:
                     logger.error(f"Error hashing {file_path}: {e}")
+            
+            for digest, group in by_partial.items():
+                if len(group) > 1:
+                    full_candidates.append((digest, group))
+                else:
+                    st = group[0][1]
+                    self.stage_stats["partial"]["skipped_files"] += 1
+                    self.stage_stats["partial"]["skipped_bytes"] += st.st_size - self._partial_bytes(st.st_size)
+        
+        # Stage 3: full hash of files that still collide, reading only
+        # files the hash index does not know
+        duplicates = defaultdict(list)
+        full_stats = self.stage_stats["full"]
+        to_hash = []
+        for digest, group in full_candidates:
+            # Read whole by the partial stage, which counted the bytes
+            if group[0][1].st_size <= 2 * self.partial_block_size:
+                duplicates[digest].extend(file_path for file_path, _ in group)
+                continue
+            for file_path, st in group:
+                full_stats["files"] += 1
+                file_hash = self.hash_index.lookup(st, self.algorithm)
+                if file_hash is None:
+                    to_hash.append((file_path, st))
+                else:
+                    full_stats["skipped_files"] += 1
+                    full_stats["skipped_bytes"] += st.st_size
+                    duplicates[file_hash].append(file_path)
+        
+        digests = hash_files([file_path for file_path, _ in to_hash], self.algorithm, self.workers)
+        for (file_path, st), file_hash in zip(to_hash, digests):
+            if file_hash is None:
+                continue
+            self.hash_index.store(file_path, st, self.algorithm, file_hash)
+            full_stats["bytes_read"] += st.st_size
+            duplicates[file_hash].append(file_path)
+        
+        logger.info(f"Duplicate scan of {folder_path}: {self.stage_stats}")
         
         # Filter out non-duplicates
         return {
@@ -29,19 +107,33 @@ class DuplicateDetector:
             if len(paths) > 1
         }
     
+    def _partial_bytes(self, size):
+        """Number of bytes read by the partial hash of a file"""
+        return min(size, 2 * self.partial_block_size)
+    
+    def _get_partial_hash(self, file_path, stat_result):
+        """Get the first/last block hash for a file from the hash index"""
+        stats = self.stage_stats["partial"]
+        stats["files"] += 1
+        
+        # Small files are read whole, so their partial hash is the full hash
+        if stat_result.st_size <= 2 * self.partial_block_size:
+            algorithm = self.algorithm
+        else:
+            algorithm = f"{self.algorithm}-partial-{self.partial_block_size}"
+        
+        digest = self.hash_index.lookup(stat_result, algorithm)
+        if digest is None:
+            digest = generate_partial_hash(file_path, self.partial_block_size, self.algorithm)
+            self.hash_index.store(file_path, stat_result, algorithm, digest)
+            stats["bytes_read"] += self._partial_bytes(stat_result.st_size)
+        else:
+            stats["cached_files"] += 1
+        return digest
+    
     def _get_file_hash(self, file_path):
-        """Generate MD5 hash for a file"""
-        if file_path in self.hash_cache:
-            return self.hash_cache[file_path]
-        
-        hasher = hashlib.md5()
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(65536), b''):
-                hasher.update(chunk)
-        
-        file_hash = hasher.hexdigest()
-        self.hash_cache[file_path] = file_hash
-        return file_hash
+        """Get the content hash of a file from the persistent hash index"""
+        return self.hash_index.get_hash(file_path, self.algorithm)
     
     def get_file_similarity(self, file1, file2):
         """Calculate similarity between two files"""
@@ -49,4 +141,4 @@ class DuplicateDetector:
         try:
             return 1.0 if self._get_file_hash(file1) == self._get_file_hash(file2) else 0.0
         except:
-            return 0.0
\ No newline at end of file
+            return 0.0
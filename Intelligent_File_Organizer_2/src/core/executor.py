@@ -0,0 +1,293 @@
+import os
+import re
+import sys
+import time
+import errno
+import shutil
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from ..utils.file_utils import get_file_info
+from ..utils.hash_index import get_hash_index
+
+logger = logging.getLogger(__name__)
+
+# Number of files handed to the pool per round, per worker
+CHUNK_PER_WORKER = 32
+
+# Matches the "_<n>" suffix added when renaming on a name collision; a
+# name that already ends in one gets another ("a_1" -> "a_1_1")
+RENAME_SUFFIX = re.compile(r"_\d+$")
+
+# Cross-device copies of files at least this large use parallel streams
+PARALLEL_COPY_MIN_SIZE = 64 * 1024 * 1024
+COPY_STREAMS = 4
+
+# st_dev of destination folders, looked up once per folder and run
+_folder_devices = {}
+
+
+def _folder_device(folder):
+    device = _folder_devices.get(folder)
+    if device is None:
+        device = os.stat(folder).st_dev
+        _folder_devices[folder] = device
+    return device
+
+
+def _copy_range(src, dst, offset, count):
+    """Copy count bytes at offset from src to dst inside the kernel when
+    the platform allows it.
+
+    A method that stops short (unsupported, or copying nothing) leaves the
+    rest to the next one: copy_file_range, sendfile, then a buffered copy.
+    Raises OSError if the range still is not fully copied, since dst was
+    already extended to its full size and would otherwise be zero-padded.
+    """
+    with open(src, 'rb') as fsrc, open(dst, 'r+b') as fdst:
+        infd, outfd = fsrc.fileno(), fdst.fileno()
+        end = offset + count
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while offset < end:
+                    copied = os.copy_file_range(infd, outfd, end - offset, offset, offset)
+                    if copied == 0:
+                        break
+                    offset += copied
+            except OSError as e:
+                # Filesystems without support fall through to sendfile
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                    raise
+        if offset < end and hasattr(os, 'sendfile'):
+            try:
+                os.lseek(outfd, offset, os.SEEK_SET)
+                while offset < end:
+                    sent = os.sendfile(outfd, infd, offset, end - offset)
+                    if sent == 0:
+                        break
+                    offset += sent
+            except OSError as e:
+                if e.errno not in (errno.ENOSYS, errno.EINVAL, errno.ENOTSOCK, errno.EOPNOTSUPP):
+                    raise
+        if offset < end:
+            buffer = bytearray(1024 * 1024)
+            fsrc.seek(offset)
+            fdst.seek(offset)
+            while offset < end:
+                read = fsrc.readinto(memoryview(buffer)[:min(len(buffer), end - offset)])
+                if not read:
+                    break
+                fdst.write(memoryview(buffer)[:read])
+                offset += read
+        if offset < end:
+            raise OSError(errno.EIO, f"Short copy: {end - offset} bytes of {src} not copied", dst)
+
+
+def copy_file(src, dst, size, streams=COPY_STREAMS):
+    """Copy file data, splitting large files into parallel streams"""
+    with open(dst, 'wb') as f:
+        f.truncate(size)
+    if size < PARALLEL_COPY_MIN_SIZE or streams <= 1:
+        _copy_range(src, dst, 0, size)
+        return
+    part = -(-size // streams)
+    with ThreadPoolExecutor(max_workers=streams) as pool:
+        futures = [pool.submit(_copy_range, src, dst, offset, min(part, size - offset))
+                   for offset in range(0, size, part)]
+        for future in futures:
+            future.result()
+
+
+def fast_move(src, dst, src_stat=None):
+    """Move a file and return how: "rename" or "copy".
+
+    Moves within one device are a single os.rename. Across devices the data
+    is copied to a temporary name next to dst, metadata is copied with
+    shutil.copystat, the copy is renamed into place and only then the
+    source is removed, so an interrupted move never leaves a partial file
+    at dst. src_stat may come from an earlier scan; only its st_dev is
+    trusted, the copy path stats the file again for its current size.
+    """
+    src_stat = src_stat or os.stat(src)
+    if src_stat.st_dev == _folder_device(os.path.dirname(os.path.abspath(dst))):
+        try:
+            os.rename(src, dst)
+            return "rename"
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+    if not os.path.isfile(src) or os.path.islink(src):
+        shutil.move(src, dst)
+        return "copy"
+
+    temp_path = f"{dst}.part-{os.getpid()}"
+    try:
+        copy_file(src, temp_path, os.stat(src).st_size)
+        shutil.copystat(src, temp_path)
+        os.replace(temp_path, dst)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.remove(src)
+    return "copy"
+
+
+def handle_duplicate(source_file, existing_file):
+    """Resolve a name collision.
+
+    Returns (True, None) when the source is an exact duplicate and was
+    removed, otherwise (False, free_path) with the next free name.
+    """
+    hash_index = get_hash_index()
+    if hash_index.get_hash(source_file) == hash_index.get_hash(existing_file):
+        logger.info(f"Exact duplicate found: {source_file}")
+        os.remove(source_file)
+        return True, None
+
+    # Rename if not duplicate
+    base, ext = os.path.splitext(existing_file)
+    counter = 1
+    new_path = existing_file
+    while os.path.exists(new_path):
+        new_path = f"{base}_{counter}{ext}"
+        counter += 1
+
+    return False, new_path
+
+
+def move_file(file_path, dest_path, make_dirs=True, src_stat=None):
+    """Move one file to dest_path and return a result record.
+
+    make_dirs=False skips creating the destination folder, for callers that
+    created all folders up front. src_stat is the file's stat from the scan,
+    reused instead of stat-ing the file again.
+    """
+    result = {'path': file_path, 'destination': dest_path, 'status': 'moved'}
+    try:
+        # Already in place (e.g. re-organizing an organized subfolder)
+        if os.path.abspath(file_path) == os.path.abspath(dest_path):
+            result['status'] = 'preserved'
+            return result
+
+        if make_dirs:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+
+        if os.path.exists(dest_path):
+            is_duplicate, dest_path = handle_duplicate(file_path, result['destination'])
+            if is_duplicate:
+                result['status'] = 'duplicates'
+                return result
+            result['destination'] = dest_path
+
+        src_stat = src_stat or os.stat(file_path)
+        start = time.perf_counter()
+        result['mode'] = fast_move(file_path, dest_path, src_stat)
+        result['seconds'] = time.perf_counter() - start
+        result['bytes'] = src_stat.st_size
+        # Size and mtime survive the move, so the scan stat describes dest_path
+        result['file_info'] = get_file_info(dest_path, src_stat)
+    except Exception as e:
+        logger.error(f"Error processing {file_path}: {e}")
+        result['status'] = 'errors'
+        result['error'] = str(e)
+    return result
+
+
+def move_group(tasks, make_dirs=True):
+    """Move a list of (source, destination, stat) tasks in order.
+
+    All pairs in a group may collide with each other, so running them
+    sequentially keeps collision handling identical to a serial run.
+    """
+    results = [move_file(file_path, dest_path, make_dirs, src_stat)
+               for file_path, dest_path, src_stat in tasks]
+    # Pool processes exit without running atexit hooks
+    get_hash_index().flush()
+    return results
+
+
+def _normalize_path(path):
+    """Path as the filesystem compares names: case-folded on Windows and
+    macOS, whose default filesystems are case-insensitive"""
+    path = os.path.normcase(path)
+    return path.lower() if sys.platform == "darwin" else path
+
+
+def _conflict_key(path, planned):
+    """Key shared by paths that may collide with path.
+
+    planned holds the normalized paths of a batch. A "_<n>" name is folded
+    into the name without the suffix only if that name is in planned too,
+    since a collision on it could rename to this path. Numbered series like
+    "IMG_0001.jpg" keep one key per file.
+    """
+    key = _normalize_path(path)
+    base, ext = os.path.splitext(key)
+    while True:
+        match = RENAME_SUFFIX.search(base)
+        if match is None:
+            return key
+        base = base[:match.start()]
+        if base + ext in planned:
+            key = base + ext
+
+
+def _group_by_destination(chunk):
+    """Group (index, source, destination, stat) items that may collide"""
+    planned = {_normalize_path(item[2]) for item in chunk}
+    groups = OrderedDict()
+    for item in chunk:
+        groups.setdefault(_conflict_key(item[2], planned), []).append(item)
+    return groups
+
+
+def iter_moves(tasks, workers=1, executor="thread", make_dirs=True):
+    """Move (source, destination) or (source, destination, stat) tasks and
+    yield results in input order.
+
+    With workers > 1 the tasks are processed in chunks on a thread or
+    process pool. Pairs that could collide (same destination, or a "_<n>"
+    rename of it) are handled by the same worker in input order, and a
+    chunk is finished before the next one starts, so conflict resolution
+    matches the serial result.
+    """
+    tasks = (task if len(task) == 3 else (task[0], task[1], None) for task in tasks)
+    # A folder may have been remounted since the last run of a long-lived
+    # process (scheduler, GUI)
+    _folder_devices.clear()
+    if workers <= 1:
+        for file_path, dest_path, src_stat in tasks:
+            yield move_file(file_path, dest_path, make_dirs, src_stat)
+        return
+
+    pool_class = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    chunk_size = workers * CHUNK_PER_WORKER
+
+    with pool_class(max_workers=workers) as pool:
+        chunk = []
+        for index, task in enumerate(tasks):
+            chunk.append((index,) + tuple(task))
+            if len(chunk) >= chunk_size:
+                yield from _run_chunk(pool, chunk, make_dirs)
+                chunk = []
+        if chunk:
+            yield from _run_chunk(pool, chunk, make_dirs)
+
+
+def _run_chunk(pool, chunk, make_dirs=True):
+    """Run one chunk on the pool and yield its results in input order"""
+    groups = _group_by_destination(chunk)
+    futures = []
+    for items in groups.values():
+        group_tasks = [item[1:] for item in items]
+        futures.append(([item[0] for item in items], pool.submit(move_group, group_tasks, make_dirs)))
+
+    results = {}
+    for indices, future in futures:
+        for index, result in zip(indices, future.result()):
+            results[index] = result
+
+    for item in chunk:
+        yield results.pop(item[0])
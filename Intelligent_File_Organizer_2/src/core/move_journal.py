@@ -0,0 +1,343 @@
+import os
+import uuid
+import errno
+import shutil
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from .executor import fast_move, _conflict_key, _normalize_path
+
+logger = logging.getLogger(__name__)
+
+
+def _group_dependent(entries):
+    """Group journal entries whose paths share a conflict key, directly or
+    through a chain of entries, keeping their order within each group"""
+    parent = {}
+
+    def find(key):
+        while parent.setdefault(key, key) != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    planned = set()
+    for _, source, destination, _ in entries:
+        planned.add(_normalize_path(source))
+        planned.add(_normalize_path(destination))
+    for _, source, destination, _ in entries:
+        a, b = find(_conflict_key(source, planned)), find(_conflict_key(destination, planned))
+        if a != b:
+            parent[a] = b
+    groups = {}
+    for entry in entries:
+        groups.setdefault(find(_conflict_key(entry[2], planned)), []).append(entry)
+    return list(groups.values())
+
+
+class MoveJournal:
+    """Journal of the moves made by organize runs, used to undo them.
+
+    Every run gets an ID in organize_runs; each move or duplicate removal
+    is a row in move_journal. Rows are buffered and written batch_size at a
+    time in one transaction, and a run stays "running" until finish_run(),
+    so an interrupted run can still be undone up to its last written batch.
+
+    The planned moves of a run are kept in run_plan until it completes.
+    Together with the journal they tell which moves of an interrupted or
+    cancelled run are still to do, so the run can be resumed without
+    planning again.
+    """
+
+    def __init__(self, db_path="file_organizer.db", batch_size=1000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the run and move journal tables"""
+        cursor = self._conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS organize_runs (
+                run_id TEXT PRIMARY KEY,
+                started DATETIME,
+                finished DATETIME,
+                source_folder TEXT,
+                destination_folder TEXT,
+                organization_mode TEXT,
+                status TEXT
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS move_journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id TEXT,
+                source TEXT,
+                destination TEXT,
+                action TEXT,
+                undone INTEGER DEFAULT 0
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_move_journal_run
+            ON move_journal (run_id, undone)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_move_journal_source
+            ON move_journal (run_id, source)
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS run_plan (
+                run_id TEXT,
+                position INTEGER,
+                source TEXT,
+                destination TEXT,
+                PRIMARY KEY (run_id, position)
+            ) WITHOUT ROWID
+        ''')
+        # Added after the first release
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(organize_runs)')}
+        if 'checkpoint' not in columns:
+            cursor.execute('ALTER TABLE organize_runs ADD COLUMN checkpoint DATETIME')
+        self._conn.commit()
+
+    def begin_run(self, source_folder, destination_folder, organization_mode):
+        """Register a new run and return its ID"""
+        run_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute('''
+                INSERT INTO organize_runs
+                (run_id, started, source_folder, destination_folder, organization_mode, status)
+                VALUES (?, ?, ?, ?, ?, 'running')
+            ''', (run_id, datetime.now().isoformat(" "), source_folder, destination_folder,
+                  organization_mode))
+            self._conn.commit()
+        return run_id
+
+    def save_plan(self, run_id, tasks):
+        """Store the (source, destination, ...) move tasks of a run"""
+        rows = ((run_id, position, task[0], task[1]) for position, task in enumerate(tasks))
+        with self._lock, self._conn:
+            self._conn.executemany('''
+                INSERT INTO run_plan (run_id, position, source, destination)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+
+    def pending_tasks(self, run_id):
+        """(source, destination) of the planned moves of a run that are not
+        in the journal, in plan order"""
+        self.flush()
+        return self._conn.execute('''
+            SELECT p.source, p.destination FROM run_plan p
+            WHERE p.run_id = ? AND NOT EXISTS (
+                SELECT 1 FROM move_journal m WHERE m.run_id = p.run_id AND m.source = p.source
+            )
+            ORDER BY p.position
+        ''', (run_id,)).fetchall()
+
+    def checkpoint(self, run_id):
+        """Write buffered rows so the run can resume from here"""
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                self._conn.execute('UPDATE organize_runs SET checkpoint = ? WHERE run_id = ?',
+                                   (datetime.now().isoformat(" "), run_id))
+
+    def reopen_run(self, run_id):
+        """Mark an interrupted or cancelled run as running again"""
+        with self._lock, self._conn:
+            self._conn.execute('''
+                UPDATE organize_runs SET status = 'running', finished = NULL WHERE run_id = ?
+            ''', (run_id,))
+
+    def resumable_run(self, source_folder=None):
+        """ID of the latest run that stopped before finishing its plan
+        (status running, cancelled or failed), optionally only for one
+        source folder, or None"""
+        query = '''
+            SELECT r.run_id FROM organize_runs r
+            WHERE r.status IN ('running', 'cancelled', 'failed')
+            AND EXISTS (SELECT 1 FROM run_plan p WHERE p.run_id = r.run_id)
+        '''
+        params = ()
+        if source_folder is not None:
+            query += ' AND r.source_folder = ?'
+            params = (source_folder,)
+        row = self._conn.execute(query + ' ORDER BY r.started DESC LIMIT 1', params).fetchone()
+        return row[0] if row else None
+
+    def record(self, run_id, source, destination, action="moved"):
+        """Record a move ("moved") or a removed duplicate of destination
+        ("duplicate")"""
+        with self._lock:
+            self._buffer.append((run_id, source, destination, action))
+            if len(self._buffer) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """Write all buffered journal rows"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        with self._conn:
+            self._conn.executemany('''
+                INSERT INTO move_journal (run_id, source, destination, action)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+
+    def finish_run(self, run_id, status="completed"):
+        """Write remaining rows and mark the run finished; the plan of a
+        completed run is dropped"""
+        now = datetime.now().isoformat(" ")
+        with self._lock:
+            self._flush_locked()
+            with self._conn:
+                self._conn.execute('''
+                    UPDATE organize_runs SET finished = ?, checkpoint = ?, status = ? WHERE run_id = ?
+                ''', (now, now, status, run_id))
+                if status == "completed":
+                    self._conn.execute('DELETE FROM run_plan WHERE run_id = ?', (run_id,))
+
+    def list_runs(self, limit=20, run_id=None):
+        """Most recent runs as dicts, newest first (only run_id if given)"""
+        where, params = ('WHERE r.run_id = ?', (run_id, limit)) if run_id else ('', (limit,))
+        rows = self._conn.execute(f'''
+            SELECT r.run_id, r.started, r.finished, r.source_folder, r.destination_folder,
+                   r.organization_mode, r.status, r.checkpoint,
+                   (SELECT COUNT(*) FROM move_journal m WHERE m.run_id = r.run_id AND m.undone = 0)
+            FROM organize_runs r
+            {where}
+            ORDER BY r.started DESC
+            LIMIT ?
+        ''', params).fetchall()
+        keys = ('run_id', 'started', 'finished', 'source_folder', 'destination_folder',
+                'organization_mode', 'status', 'checkpoint', 'pending_moves')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def get_run(self, run_id):
+        """A run as a dict like list_runs, or None"""
+        runs = self.list_runs(limit=1, run_id=run_id)
+        return runs[0] if runs else None
+
+    def latest_run(self):
+        """ID of the most recent run that is not fully undone, or None"""
+        row = self._conn.execute('''
+            SELECT run_id FROM organize_runs WHERE status != 'undone'
+            ORDER BY started DESC LIMIT 1
+        ''').fetchone()
+        return row[0] if row else None
+
+    def undo_run(self, run_id=None, workers=8):
+        """Move the files of a run back to where they came from.
+
+        Entries are replayed newest first. Moves are undone with fast_move,
+        so on the same filesystem nothing is copied; the renames run on
+        worker threads after all original folders have been created. Moves
+        whose paths may collide (a "_<n>" rename, or one move's source being
+        another's destination) are undone by one thread in reverse order. A file
+        is never restored over an existing one. Removed duplicates are
+        restored first, by copying the file they duplicated. Entries that fail stay
+        in the journal, so undo_run can be repeated.
+        """
+        self.flush()
+        run_id = run_id or self.latest_run()
+        stats = {"restored": 0, "errors": 0, "run_id": run_id}
+        if run_id is None:
+            return stats
+
+        entries = self._conn.execute('''
+            SELECT id, source, destination, action FROM move_journal
+            WHERE run_id = ? AND undone = 0
+            ORDER BY id DESC
+        ''', (run_id,)).fetchall()
+
+        for folder in {os.path.dirname(source) for _, source, _, _ in entries}:
+            os.makedirs(folder, exist_ok=True)
+
+        # Restore removed duplicates first, while the files they duplicated
+        # are still in place
+        moves = [entry for entry in entries if entry[3] == "moved"]
+        done = []
+        for entry in entries:
+            if entry[3] == "duplicate":
+                ok = self._undo_entry(entry)
+                stats["restored" if ok else "errors"] += 1
+                if ok:
+                    done.append(entry[0])
+        # Moves that may depend on each other stay in one group, newest
+        # first; whole groups are dealt to one slice per worker, which keeps
+        # per-file overhead down to the rename
+        slices = [[] for _ in range(workers)]
+        for i, group in enumerate(_group_dependent(moves)):
+            slices[i % workers].extend(group)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for entries_slice, results in zip(slices, pool.map(self._undo_entries, slices)):
+                for entry, ok in zip(entries_slice, results):
+                    stats["restored" if ok else "errors"] += 1
+                    if ok:
+                        done.append(entry[0])
+
+        row = self._conn.execute('SELECT destination_folder FROM organize_runs WHERE run_id = ?',
+                                 (run_id,)).fetchone()
+        if row and row[0]:
+            self._remove_empty_folders({os.path.dirname(destination) for _, _, destination, _ in moves},
+                                       row[0])
+
+        with self._lock, self._conn:
+            self._conn.executemany('UPDATE move_journal SET undone = 1 WHERE id = ?',
+                                   [(entry_id,) for entry_id in done])
+            if stats["errors"] == 0:
+                self._conn.execute("UPDATE organize_runs SET status = 'undone' WHERE run_id = ?",
+                                   (run_id,))
+        logger.info(f"Undo of run {run_id} complete. Stats: {stats}")
+        return stats
+
+    def _undo_entries(self, entries):
+        return [self._undo_entry(entry) for entry in entries]
+
+    def _undo_entry(self, entry):
+        """Reverse one journal entry; returns True on success"""
+        _, source, destination, action = entry
+        try:
+            if os.path.lexists(source):
+                raise FileExistsError(errno.EEXIST, "Original location is occupied", source)
+            if action == "duplicate":
+                shutil.copy2(destination, source)
+                return True
+            fast_move(destination, source)
+            return True
+        except OSError as e:
+            logger.error(f"Could not restore {source}: {e}")
+            return False
+
+    def _remove_empty_folders(self, folders, destination_folder):
+        """Remove folders under destination_folder left empty by an undo"""
+        root = os.path.abspath(destination_folder)
+        pending = set()
+        for folder in folders:
+            folder = os.path.abspath(folder)
+            while folder != root and folder.startswith(root + os.sep):
+                pending.add(folder)
+                folder = os.path.dirname(folder)
+        # Deepest first, so parents are empty by the time they are tried
+        for folder in sorted(pending, key=len, reverse=True):
+            try:
+                os.rmdir(folder)
+            except OSError:
+                pass
+
+    def close(self):
+        """Write buffered rows and close the connection"""
+        with self._lock:
+            self._flush_locked()
+            self._conn.close()
@@ -1,22 +1,69 @@
 import os
-import shutil
 import json
-from datetime import datetime
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import logging
-from ..ai.classifier import FileClassifier
-from ..ai.clustering import FileClustering
-from ..utils.file_utils import get_file_info, generate_hash
 from ..utils.analytics import Analytics
+from ..utils.hash_index import get_hash_index
+from ..utils.scanner import scan_files, FileRecord, FileStat
+from ..utils.metrics import RunMetrics, write_prometheus_file
+from ..utils.hashing import set_default_algorithm
+from ..utils.devices import group_by_device, device_kind, device_workers
+from .executor import iter_moves
+from .scan_journal import ScanJournal
+from .move_journal import MoveJournal
+from .rules import RuleEngine
+from .plan import OrganizePlan, MOVE, PRESERVE, ERROR
+from .progress import ProgressTracker, SCAN_STAGE, PLAN_STAGE, MOVE_STAGE, DONE_STAGE
 
 logger = logging.getLogger(__name__)
 
 class SmartOrganizer:
     def __init__(self, config_path="config.json"):
+        start = time.perf_counter()
         self.config = self._load_config(config_path)
-        self.classifier = FileClassifier()
-        self.clustering = FileClustering()
+        self.rules = RuleEngine(self.config)
+        self._set_hash_algorithm(self.config["rules"].get("hash_algorithm", "md5"))
+        self._classifier = None
+        self._clustering = None
         self.analytics = Analytics()
+        self.journal = MoveJournal(self.analytics.db_path)
+        self._ai_categories = {}
+        # The classifier is shared by plans running on several threads
+        self._classify_lock = threading.Lock()
+        
+        # Startup cost, tracked against the cold start budget
+        self.startup_time = time.perf_counter() - start
+        logger.info(f"Organizer started in {self.startup_time * 1000:.1f} ms")
+    
+    @property
+    def classifier(self):
+        """AI classifier, created on first use so non-AI modes never load it"""
+        if self._classifier is None:
+            from ..ai.classifier import FileClassifier
+            from ..ai.cache import ClassificationCache, ContentCache
+            from ..ai.content import ContentExtractor
+            rules = self.config["rules"]
+            extractor = ContentExtractor(
+                cache=ContentCache(self.analytics.db_path),
+                workers=rules.get("content_workers", 2),
+                timeout=rules.get("content_timeout", 10),
+                max_bytes=rules.get("content_max_kb", 64) * 1024
+            )
+            self._classifier = FileClassifier(cache=ClassificationCache(self.analytics.db_path),
+                                              extractor=extractor)
+        return self._classifier
+    
+    @property
+    def clustering(self):
+        """File clustering, created on first use"""
+        if self._clustering is None:
+            from ..ai.clustering import FileClustering
+            self._clustering = FileClustering()
+        return self._clustering
         
     def _load_config(self, config_path):
         """Load configuration from JSON file"""
@@ -39,7 +86,16 @@ class SmartOrganizer:
                 "min_duplicate_similarity": 0.85,
                 "cluster_similar_files": False,
                 "preserve_folder_structure": True,
-                "organization_mode": "type"
+                "organization_mode": "type",
+                "workers": 1,
+                "executor": "thread",
+                "metrics_textfile_dir": None,
+                "hash_algorithm": "md5",
+                "checkpoint_interval": 5,
+                "device_workers": {"rotational": 1, "ssd": 4, "unknown": 2},
+                "content_workers": 2,
+                "content_timeout": 10,
+                "content_max_kb": 64
             },
             "size_categories": {
                 "small": {
@@ -57,7 +113,8 @@ class SmartOrganizer:
                 "very_large": {
                     "folder_name": "very_large_files"
                 }
-            }
+            },
+            "custom_rules": []
         }
         
         if os.path.exists(config_path):
@@ -85,168 +142,542 @@ class SmartOrganizer:
         
         return default_config
     
+    def _set_hash_algorithm(self, algorithm):
+        """Use algorithm for content hashes, falling back to MD5 when its
+        backend is not installed"""
+        try:
+            set_default_algorithm(algorithm)
+        except ValueError as e:
+            logger.warning(f"{e}. Using md5.")
+            set_default_algorithm("md5")
+    
     def organize_folder(self, source_folder, destination_folder=None, **kwargs):
-        """Organize files with various modes and options"""
+        """Organize files with various modes and options.
+        
+        Runs plan_organization and then execute_plan. Pass plan= to execute
+        a plan that was already made (e.g. after a preview).
+        
+        progress= is called with a ProgressEvent (see core.progress) at most
+        every progress_interval seconds (default 0.1), at each stage change
+        and once when the run is done.
+        
+        cancel= is a threading.Event (or anything with is_set()). Once it is
+        set the run stops at the next file: a cancel while planning moves
+        nothing, a cancel while moving finishes the moves in flight and
+        leaves the run resumable with resume_run().
+        """
+        incremental = kwargs.get('incremental', False)
+        files = kwargs.get('files')
+        cancel = kwargs.get('cancel')
+        progress = ProgressTracker.wrap(kwargs.get('progress'), kwargs.get('progress_interval', 0.1))
+        kwargs['progress'] = progress
+        
+        plan = kwargs.get('plan')
+        if plan is None:
+            plan = self.plan_organization(source_folder, destination_folder, **kwargs)
+        
+        if cancel is not None and cancel.is_set():
+            logger.info(f"Organization of {source_folder} cancelled while planning")
+            stats = {"moved": 0, "duplicates": 0, "errors": 0, "preserved": 0, "cancelled": True}
+            progress.finish(stats)
+            return stats
+        
+        stats = self.execute_plan(
+            plan,
+            workers=kwargs.get('workers'),
+            executor=kwargs.get('executor'),
+            progress=progress,
+            cancel=cancel
+        )
+        
+        # A cancelled run did not look at every changed file
+        if incremental and files is None and not stats["cancelled"] and plan.scan_journal is not None:
+            # Save the scan the run was planned from; execute_plan marked
+            # the files that failed as changed
+            plan.scan_journal.commit(source_folder)
+        
+        progress.finish(stats)
+        return stats
+    
+    def organize_roots(self, source_folders, destination_folder=None, **kwargs):
+        """Organize several folders as one run, scheduled by storage device.
+        
+        Folders are grouped by the device (st_dev) they are on. Each device
+        gets its own thread and a budget of concurrent file operations from
+        rules.device_workers ("rotational", "ssd" and "unknown" counts, or a
+        path on a device for that device), so a spinning disk is not
+        thrashed while SSDs are kept busy. Within the budget, several
+        folders of one device are organized at once, each with its share of
+        the budget as move workers; devices run in parallel.
+        
+        Takes the options of organize_folder except files, plan and
+        progress; cancel stops every folder. Each folder is still its own
+        journaled run. Returns the summed counts plus per-folder stats under
+        "roots" and per-device throughput under "devices"; "mb_per_second"
+        is the aggregate over the whole run.
+        """
+        for option in ('files', 'plan', 'progress', 'workers'):
+            kwargs.pop(option, None)
+        budgets = self.config["rules"].get("device_workers")
+        start = time.perf_counter()
+        
+        devices = {}
+        # A folder listed twice would be organized twice at once
+        for device, folders in group_by_device(dict.fromkeys(source_folders)).items():
+            workers = device_workers(device, budgets)
+            devices[device] = {"kind": device_kind(device), "workers": workers, "roots": folders,
+                               "files": 0, "bytes": 0, "seconds": 0.0}
+        logger.info(f"Organizing {sum(len(info['roots']) for info in devices.values())} folders "
+                    f"on {len(devices)} devices: "
+                    + ", ".join(f"{device} ({info['kind']}, {info['workers']} workers): {len(info['roots'])}"
+                                for device, info in devices.items()))
+        
+        roots = {}
+        
+        def organize_root(folder, workers):
+            try:
+                return self.organize_folder(folder, destination_folder, workers=workers, **kwargs)
+            except Exception as e:
+                logger.error(f"Error organizing {folder}: {e}")
+                return {"moved": 0, "duplicates": 0, "errors": 1, "preserved": 0,
+                        "cancelled": False, "error": str(e)}
+        
+        def organize_device(device):
+            info = devices[device]
+            device_start = time.perf_counter()
+            # Split the budget between the folders running at once
+            concurrent = min(info["workers"], len(info["roots"]))
+            workers = max(1, info["workers"] // concurrent)
+            with ThreadPoolExecutor(max_workers=concurrent) as pool:
+                for folder, stats in zip(info["roots"],
+                                         pool.map(lambda folder: organize_root(folder, workers), info["roots"])):
+                    roots[folder] = stats
+                    for mode_stats in stats.get("throughput", {}).values():
+                        info["files"] += mode_stats["files"]
+                        info["bytes"] += mode_stats["bytes"]
+            info["seconds"] = time.perf_counter() - device_start
+        
+        # One thread per device; a device's folders queue on its own threads
+        with ThreadPoolExecutor(max_workers=max(1, len(devices))) as pool:
+            list(pool.map(organize_device, devices))
+        
+        seconds = time.perf_counter() - start
+        stats = {key: sum(root.get(key, 0) for root in roots.values())
+                 for key in ("moved", "duplicates", "errors", "preserved")}
+        stats["cancelled"] = any(root.get("cancelled") for root in roots.values())
+        for info in devices.values():
+            info["mb_per_second"] = info["bytes"] / (1024 * 1024) / info["seconds"] if info["seconds"] > 0 else 0.0
+        total_bytes = sum(info["bytes"] for info in devices.values())
+        stats.update({
+            "seconds": seconds,
+            "bytes": total_bytes,
+            "files_per_second": stats["moved"] / seconds if seconds > 0 else 0.0,
+            "mb_per_second": total_bytes / (1024 * 1024) / seconds if seconds > 0 else 0.0,
+            "devices": {str(device): info for device, info in devices.items()},
+            "roots": roots
+        })
+        logger.info(f"Organized {len(roots)} folders in {seconds:.2f} s: {stats['moved']} files, "
+                    f"{total_bytes / (1024 * 1024):.1f} MB at {stats['mb_per_second']:.1f} MB/s")
+        return stats
+    
+    def iter_organize(self, source_folder, destination_folder=None, **kwargs):
+        """Run organize_folder on a background thread and yield its progress.
+        
+        Yields the ProgressEvents of the run; the last one has stage "done"
+        and carries the run statistics. An error of the run is raised from
+        the generator. The run continues if the generator is abandoned.
+        """
+        events = queue.Queue()
+        kwargs['progress'] = events.put
+        
+        def run():
+            try:
+                self.organize_folder(source_folder, destination_folder, **kwargs)
+            except BaseException as e:
+                events.put(e)
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        while True:
+            event = events.get()
+            if isinstance(event, BaseException):
+                thread.join()
+                raise event
+            yield event
+            if event.stage == DONE_STAGE:
+                break
+        thread.join()
+    
+    def plan_organization(self, source_folder, destination_folder=None, **kwargs):
+        """Decide where every file goes without moving anything"""
         # Get parameters from kwargs with defaults
         organization_mode = kwargs.get('organization_mode', 'type')
         preserve_structure = kwargs.get('preserve_structure', True)
         include_subfolders = kwargs.get('include_subfolders', False)
+        incremental = kwargs.get('incremental', False)
+        files = kwargs.get('files')
+        cancel = kwargs.get('cancel')
+        progress = ProgressTracker.wrap(kwargs.get('progress'), kwargs.get('progress_interval', 0.1))
         
         if not destination_folder:
             destination_folder = source_folder
             
-        logger.info(f"Starting organization of {source_folder} with mode: {organization_mode}")
-        stats = {"moved": 0, "duplicates": 0, "errors": 0, "preserved": 0}
+        logger.info(f"Planning organization of {source_folder} with mode: {organization_mode}")
+        metrics = RunMetrics()
         
         # Get all files to process based on settings
-        files_to_process = self._get_files_to_process(source_folder, include_subfolders, preserve_structure)
+        progress.set_stage(SCAN_STAGE)
+        journal = None
+        with metrics.stage("scan"):
+            if files is not None:
+                files_to_process = self._get_listed_files(source_folder, files)
+                progress.scanned(len(files_to_process))
+            elif incremental:
+                journal = ScanJournal(self.analytics.db_path)
+                changed_files = journal.changed_files(source_folder, include_subfolders)
+                files_to_process = self._get_listed_files(source_folder, changed_files)
+                progress.scanned(len(files_to_process))
+            else:
+                files_to_process = self._get_files_to_process(source_folder, include_subfolders,
+                                                              progress, cancel)
+        metrics.count("files_scanned", len(files_to_process))
+        metrics.add_bytes("scan", sum(record.stat.st_size for record in files_to_process
+                                      if record.stat is not None))
         
-        # Process files based on organization mode
-        for file_info in files_to_process:
-            try:
-                file_path = file_info['path']
-                
-                # Skip if file is in a preserved folder
-                if file_info.get('preserve', False):
-                    stats["preserved"] += 1
-                    continue
-                
-                # Determine destination based on organization mode
-                if organization_mode == "type":
-                    dest_folder = self._organize_by_type(file_path, destination_folder)
-                elif organization_mode == "date":
-                    dest_folder = self._organize_by_date(file_path, destination_folder)
-                elif organization_mode == "size":
-                    dest_folder = self._organize_by_size(file_path, destination_folder)
-                elif organization_mode == "ai":
-                    dest_folder = self._organize_by_ai(file_path, destination_folder)
-                else:
-                    dest_folder = destination_folder
-                
-                # Create destination directory
-                os.makedirs(dest_folder, exist_ok=True)
-                
-                # Handle duplicates
-                dest_path = os.path.join(dest_folder, os.path.basename(file_path))
-                if os.path.exists(dest_path):
-                    if self._handle_duplicate(file_path, dest_path):
-                        stats["duplicates"] += 1
+        # Files in subfolders are left in place when preserving the structure
+        preserve = include_subfolders and preserve_structure
+        
+        # Classify all files up front so images go through the model in batches
+        if organization_mode == "ai":
+            paths = [record.path for record in files_to_process
+                     if not (preserve and record.relative_dir != ".")]
+            with self._classify_lock:
+                with metrics.stage("classify"):
+                    categories = self.classifier.classify_batch(paths)
+                if self.config["rules"]["use_content_analysis"]:
+                    # Text of all documents is extracted in one parallel batch
+                    with metrics.stage("content"):
+                        categories = self.classifier.analyze_content_batch(paths, categories)
+            self._ai_categories.update(zip(paths, categories))
+        
+        plan = OrganizePlan(source_folder, destination_folder, organization_mode)
+        plan.scan_journal = journal
+        progress.set_stage(PLAN_STAGE)
+        # One timer around the loop; per-file latency uses perf_counter only,
+        # which is much cheaper than reading the CPU clock per file
+        with metrics.stage("rules"):
+            for record in files_to_process:
+                if cancel is not None and cancel.is_set():
+                    break
+                file_path = record.path
+                file_start = time.perf_counter()
+                progress.planned()
+                try:
+                    if record.stat is None:
+                        raise FileNotFoundError(f"Could not stat {file_path}")
+                    
+                    # Skip if file is in a preserved folder
+                    if preserve and record.relative_dir != ".":
+                        plan.add(file_path, action=PRESERVE, stat=record.stat)
                         continue
-                
-                # Move file
-                shutil.move(file_path, dest_path)
-                stats["moved"] += 1
-                
-                # Update analytics
-                file_info = get_file_info(dest_path)
-                self.analytics.log_organization(file_info, os.path.basename(dest_folder))
-                
-            except Exception as e:
-                logger.error(f"Error processing {file_path}: {e}")
-                stats["errors"] += 1
+                    
+                    # Determine destination based on organization mode
+                    dest_folder = self._get_destination(file_path, destination_folder, organization_mode,
+                                                        record.stat)
+                    plan.add(file_path, dest_folder, MOVE, stat=record.stat)
+                    metrics.observe("rules", time.perf_counter() - file_start)
+                    
+                except Exception as e:
+                    logger.error(f"Error processing {file_path}: {e}")
+                    plan.add(file_path, action=ERROR, size=-1)
         
-        logger.info(f"Organization complete. Stats: {stats}")
-        return stats
+        if organization_mode == "ai":
+            for path in paths:
+                self._ai_categories.pop(path, None)
+        metrics.finish()
+        plan.metrics = metrics
+        logger.info(f"Planned {len(plan)} files into {len(plan.folders)} folders")
+        return plan
     
-    def _get_files_to_process(self, source_folder, include_subfolders, preserve_structure):
-        """Get list of files to process based on settings"""
-        files_to_process = []
+    def execute_plan(self, plan, workers=None, executor=None, progress=None, cancel=None, run_id=None):
+        """Apply the moves of a plan and return the run statistics.
         
-        if include_subfolders:
-            for root, dirs, files in os.walk(source_folder):
-                # Check if this is a subfolder that should be preserved
-                relative_path = os.path.relpath(root, source_folder)
-                should_preserve = preserve_structure and relative_path != "."
-                
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    file_info = {
-                        'path': file_path,
-                        'preserve': should_preserve,
-                        'relative_dir': relative_path if should_preserve else None
-                    }
-                    files_to_process.append(file_info)
-        else:
-            # Only process files in the root directory
-            for item in os.listdir(source_folder):
-                item_path = os.path.join(source_folder, item)
-                if os.path.isfile(item_path):
-                    file_info = {
-                        'path': item_path,
-                        'preserve': False,
-                        'relative_dir': None
-                    }
-                    files_to_process.append(file_info)
+        Each destination folder is created once before any move, and moves
+        are handed to the mover grouped by destination folder.
         
-        return files_to_process
-    
-    def _organize_by_type(self, file_path, destination_folder):
-        """Organize by file type/extension"""
-        ext = os.path.splitext(file_path)[1].lower()
+        stats["metrics"] holds the per-stage wall/CPU times, byte counters
+        and latency histograms of the run, planning stages included. They
+        are also stored in the runs table and, if rules.metrics_textfile_dir
+        is set, written there as a Prometheus textfile.
+        
+        progress is a ProgressTracker or callback that is told about every
+        finished move. When cancel is set no further moves are started and
+        the run ends as "cancelled". The planned moves are stored with the
+        run and the journal is written every rules.checkpoint_interval
+        seconds, so an interrupted or cancelled run can be finished with
+        resume_run(). run_id continues that existing run instead of
+        starting a new one.
+        """
+        if workers is None:
+            workers = self.config["rules"].get("workers", 1)
+        if executor is None:
+            executor = self.config["rules"].get("executor", "thread")
+        
+        started = time.time()
+        metrics = RunMetrics()
+        if plan.metrics is not None:
+            metrics.merge(plan.metrics)
+        hash_index = get_hash_index()
+        hash_counts = (hash_index.hits, hash_index.misses, hash_index.hashed_bytes)
         
-        # Check predefined categories
-        for category, extensions in self.config["folders"].items():
-            if ext in extensions:
-                return os.path.join(destination_folder, category)
+        summary = plan.summary()
+        stats = {"moved": 0, "duplicates": 0, "errors": summary["error"]["files"],
+                 "preserved": summary["preserve"]["files"]}
+        progress = ProgressTracker.wrap(progress)
+        progress.set_stage(MOVE_STAGE, summary["move"]["files"], summary["move"]["bytes"])
         
-        # Default category
-        if ext:
-            return os.path.join(destination_folder, f"{ext[1:]}_files")
+        with metrics.stage("mkdir"):
+            for folder in plan.destination_folders():
+                try:
+                    os.makedirs(folder, exist_ok=True)
+                except OSError as e:
+                    # The moves into this folder fail and are counted as errors
+                    logger.error(f"Could not create {folder}: {e}")
+        
+        # Every move is journaled under the run ID so the run can be undone
+        # or resumed
+        if run_id is None:
+            run_id = self.journal.begin_run(plan.source_folder, plan.destination_folder,
+                                            plan.organization_mode)
+            with metrics.stage("checkpoint"):
+                self.journal.save_plan(run_id, plan.move_tasks())
         else:
-            return os.path.join(destination_folder, "no_extension")
-    
-    def _organize_by_date(self, file_path, destination_folder):
-        """Organize by file modification date"""
-        file_stat = os.stat(file_path)
-        mod_time = datetime.fromtimestamp(file_stat.st_mtime)
+            self.journal.reopen_run(run_id)
+        stats["run_id"] = run_id
+        run_status = "failed"
+        checkpoint_interval = self.config["rules"].get("checkpoint_interval", 5)
+        next_checkpoint = time.monotonic() + checkpoint_interval
+        finished_moves = 0
+        
+        # Files, bytes and move time per move mode ("rename" or "copy")
+        throughput = {}
+        stats["throughput"] = throughput
+        
+        # The "move" stage covers the whole loop; "record" is the part of it
+        # spent writing journal and analytics rows
+        record_seconds = 0.0
+        # The incremental scan the plan came from learns which files to
+        # report again and which were moved into scanned folders
+        scan_journal = plan.scan_journal
+        if scan_journal is not None:
+            planned_stats = {}
+            for index, action in enumerate(plan.actions):
+                if action == ERROR:
+                    scan_journal.mark_changed(plan.sources[index])
+                elif action == MOVE:
+                    planned_stats[plan.sources[index]] = plan.stat(index)
+        tasks = plan.move_tasks()
+        if cancel is not None:
+            tasks = self._until_cancelled(tasks, cancel)
+        results = iter_moves(tasks, workers=workers, executor=executor, make_dirs=False)
+        try:
+            with metrics.stage("move"):
+                for result in results:
+                    stats[result['status']] += 1
+                    finished_moves += 1
+                    progress.done(1, result.get('bytes', 0))
+                    if 'mode' in result:
+                        mode_stats = throughput.setdefault(result['mode'], {"files": 0, "bytes": 0, "seconds": 0.0})
+                        mode_stats["files"] += 1
+                        mode_stats["bytes"] += result['bytes']
+                        mode_stats["seconds"] += result['seconds']
+                        metrics.observe("move", result['seconds'])
+                    
+                    # Update the journal and analytics
+                    record_start = time.perf_counter()
+                    if result['status'] == 'moved':
+                        self.journal.record(run_id, result['path'], result['destination'])
+                        dest_folder = os.path.dirname(result['destination'])
+                        self.analytics.log_organization(result['file_info'], os.path.basename(dest_folder),
+                                                        original_location=result['path'],
+                                                        new_location=result['destination'])
+                    elif result['status'] == 'duplicates':
+                        self.journal.record(run_id, result['path'], result['destination'], "duplicate")
+                    if scan_journal is not None:
+                        if result['status'] == 'errors':
+                            scan_journal.mark_changed(result['path'])
+                        elif result['status'] == 'moved' and planned_stats.get(result['path']) is not None:
+                            scan_journal.mark_moved(result['destination'], planned_stats[result['path']])
+                    record_seconds += time.perf_counter() - record_start
+                    
+                    if time.monotonic() >= next_checkpoint:
+                        with metrics.stage("checkpoint"):
+                            self.journal.checkpoint(run_id)
+                            self.analytics.flush()
+                        next_checkpoint = time.monotonic() + checkpoint_interval
+            run_status = "cancelled" if finished_moves < summary["move"]["files"] else "completed"
+        finally:
+            # Write buffered journal and analytics rows even if the run fails
+            with metrics.stage("flush"):
+                self.journal.finish_run(run_id, run_status)
+                self.analytics.flush()
         
-        # Create year/month structure
-        year_folder = os.path.join(destination_folder, str(mod_time.year))
-        month_folder = os.path.join(year_folder, f"{mod_time.month:02d}-{mod_time.strftime('%B')}")
+        metrics.add_time("record", record_seconds, calls=stats["moved"] + stats["duplicates"])
+        for mode, mode_stats in throughput.items():
+            seconds = mode_stats["seconds"]
+            mode_stats["mb_per_second"] = mode_stats["bytes"] / (1024 * 1024) / seconds if seconds > 0 else 0.0
+            metrics.add_bytes("move", mode_stats["bytes"])
+            metrics.count(f"{mode}_files", mode_stats["files"])
+            logger.info(f"{mode}: {mode_stats['files']} files, {mode_stats['bytes'] / (1024 * 1024):.1f} MB "
+                        f"at {mode_stats['mb_per_second']:.1f} MB/s")
         
-        return month_folder
+        # Hashing happens inside the moves, when a name collides
+        metrics.count("hash_hits", hash_index.hits - hash_counts[0])
+        metrics.count("hash_misses", hash_index.misses - hash_counts[1])
+        metrics.count("hashed_bytes", hash_index.hashed_bytes - hash_counts[2])
+        metrics.finish()
+        stats["cancelled"] = run_status == "cancelled"
+        stats["metrics"] = metrics.to_dict()
+        self._export_metrics(plan, run_id, started, stats, metrics)
+        
+        counts = {key: value for key, value in stats.items() if key != "metrics"}
+        logger.info(f"Organization complete in {metrics.wall_seconds:.2f} s. Stats: {counts}")
+        return stats
     
-    def _organize_by_size(self, file_path, destination_folder):
-        """Organize by file size"""
-        file_size = os.path.getsize(file_path)
-        file_size_mb = file_size / (1024 * 1024)
+    def _export_metrics(self, plan, run_id, started, stats, metrics):
+        """Store the run metrics and write the optional Prometheus textfile"""
+        self.analytics.log_run(run_id, started, plan.source_folder, plan.organization_mode,
+                               stats, stats["metrics"])
         
-        size_categories = self.config.get("size_categories", {})
+        textfile_dir = self.config["rules"].get("metrics_textfile_dir")
+        if not textfile_dir:
+            return
+        try:
+            labels = {"folder": os.path.abspath(plan.source_folder or ""),
+                      "mode": plan.organization_mode or ""}
+            path = write_prometheus_file(textfile_dir, plan.source_folder or "",
+                                         metrics.to_prometheus(labels, stats))
+            logger.info(f"Wrote run metrics to {path}")
+        except OSError as e:
+            logger.warning(f"Could not write metrics textfile: {e}")
+    
+    def resume_run(self, run_id=None, **kwargs):
+        """Finish an interrupted or cancelled run from its last checkpoint.
         
-        if file_size_mb < size_categories.get("small", {}).get("max_size_mb", 1):
-            folder_name = size_categories.get("small", {}).get("folder_name", "small_files")
-        elif file_size_mb < size_categories.get("medium", {}).get("max_size_mb", 10):
-            folder_name = size_categories.get("medium", {}).get("folder_name", "medium_files")
-        elif file_size_mb < size_categories.get("large", {}).get("max_size_mb", 100):
-            folder_name = size_categories.get("large", {}).get("folder_name", "large_files")
-        else:
-            folder_name = size_categories.get("very_large", {}).get("folder_name", "very_large_files")
+        Defaults to the latest resumable run. Only the planned moves that
+        are not in the journal are done; nothing is planned again. Planned
+        files that are gone were moved after the last checkpoint (or
+        deleted) and are counted as "missing". Takes the workers, executor,
+        progress, progress_interval and cancel options of organize_folder.
+        """
+        run_id = run_id or self.journal.resumable_run()
+        run = self.journal.get_run(run_id) if run_id else None
+        if run is None:
+            raise ValueError("There is no organize run to resume")
         
-        return os.path.join(destination_folder, folder_name)
+        plan = OrganizePlan(run["source_folder"], run["destination_folder"], run["organization_mode"])
+        missing = 0
+        for source, destination in self.journal.pending_tasks(run_id):
+            try:
+                file_stat = FileStat.from_stat(os.stat(source))
+            except FileNotFoundError:
+                missing += 1
+                continue
+            except OSError as e:
+                logger.error(f"Error reading {source}: {e}")
+                plan.add(source, action=ERROR, size=-1)
+                continue
+            plan.add(source, os.path.dirname(destination), MOVE, stat=file_stat)
+        logger.info(f"Resuming run {run_id}: {len(plan)} moves left, {missing} files missing")
+        
+        progress = ProgressTracker.wrap(kwargs.get('progress'), kwargs.get('progress_interval', 0.1))
+        stats = self.execute_plan(
+            plan,
+            workers=kwargs.get('workers'),
+            executor=kwargs.get('executor'),
+            progress=progress,
+            cancel=kwargs.get('cancel'),
+            run_id=run_id
+        )
+        stats["missing"] = missing
+        progress.finish(stats)
+        return stats
+    
+    def undo_run(self, run_id=None, workers=8):
+        """Move the files of an organize run (default: the latest) back"""
+        return self.journal.undo_run(run_id, workers=workers)
+    
+    def close(self):
+        """Stop the content extraction workers and write buffered journal
+        and analytics rows"""
+        if self._classifier is not None and self._classifier.extractor is not None:
+            self._classifier.extractor.close()
+        self.journal.close()
+        self.analytics.close()
+    
+    def _get_files_to_process(self, source_folder, include_subfolders, progress=None, cancel=None):
+        """Scan the files to process, each with the stat from its directory entry"""
+        if progress is None and cancel is None:
+            return list(scan_files(source_folder, include_subfolders))
+        progress = ProgressTracker.wrap(progress)
+        files_to_process = []
+        for record in scan_files(source_folder, include_subfolders):
+            if cancel is not None and cancel.is_set():
+                break
+            files_to_process.append(record)
+            progress.scanned()
+        return files_to_process
+    
+    def _until_cancelled(self, tasks, cancel):
+        """Pass tasks on until cancel is set"""
+        for task in tasks:
+            if cancel.is_set():
+                return
+            yield task
+    
+    def _get_listed_files(self, source_folder, file_paths):
+        """File records for an explicit list of paths under source_folder"""
+        files_to_process = []
+        source_folder = os.path.abspath(source_folder)
+        
+        for file_path in file_paths:
+            file_path = os.path.abspath(file_path)
+            relative_path = os.path.relpath(os.path.dirname(file_path), source_folder)
+            try:
+                file_stat = FileStat.from_stat(os.stat(file_path))
+            except OSError as e:
+                logger.error(f"Error reading {file_path}: {e}")
+                file_stat = None
+            files_to_process.append(FileRecord(file_path, relative_path, file_stat))
+        
+        return files_to_process
+    
+    def _get_destination(self, file_path, destination_folder, organization_mode, file_stat=None):
+        """Pick the destination folder of a file from the compiled rules"""
+        if file_stat is None and organization_mode in ("size", "date"):
+            file_stat = os.stat(file_path)
+        folder = self.rules.resolve(os.path.basename(file_path), file_stat, organization_mode)
+        if folder is not None:
+            return os.path.join(destination_folder, folder)
+        if organization_mode == "ai":
+            return self._organize_by_ai(file_path, destination_folder)
+        return destination_folder
     
     def _organize_by_ai(self, file_path, destination_folder):
         """Use AI classification"""
-        category = self.classifier.classify_file(file_path)
-        
-        if self.config["rules"]["use_content_analysis"]:
-            category = self.classifier.analyze_content(file_path, category)
+        category = self._ai_categories.get(file_path)
+        if category is None:
+            category = self.classifier.classify_file(file_path)
+            if self.config["rules"]["use_content_analysis"]:
+                category = self.classifier.analyze_content(file_path, category)
         
         return os.path.join(destination_folder, category)
     
-    def _handle_duplicate(self, source_file, existing_file):
-        """Handle duplicate files"""
-        # Check if files are identical
-        if generate_hash(source_file) == generate_hash(existing_file):
-            logger.info(f"Exact duplicate found: {source_file}")
-            os.remove(source_file)
-            return True
-        
-        # Rename if not duplicate
-        base, ext = os.path.splitext(existing_file)
-        counter = 1
-        new_path = existing_file
-        while os.path.exists(new_path):
-            new_path = f"{base}_{counter}{ext}"
-            counter += 1
-        
-        return False
\ No newline at end of file
+    def find_similar_images(self, folder_path):
+        """Find near-duplicate images using rules.min_duplicate_similarity"""
+        from ..ai.image_hash import NearDuplicateFinder
+        finder = NearDuplicateFinder(
+            min_similarity=self.config["rules"].get("min_duplicate_similarity", 0.85),
+            hash_index=get_hash_index(self.analytics.db_path)
+        )
+        return finder.find_in_folder(folder_path)
@@ -0,0 +1,172 @@
+import os
+import csv
+from array import array
+import numpy as np
+import logging
+from ..utils.scanner import FileStat
+
+logger = logging.getLogger(__name__)
+
+# Row actions, stored as their index
+ACTIONS = ("move", "preserve", "error")
+MOVE, PRESERVE, ERROR = range(len(ACTIONS))
+
+
+class OrganizePlan:
+    """Planned result of an organize run, one row per file.
+
+    Rows are (source, destination, action, size) and are stored column by
+    column: source paths in a list, destination folders as indexes into a
+    table of distinct folders, actions, sizes and the rest of the file's
+    scan-time stat in typed arrays, so execution can reuse it. A row's
+    destination is its folder joined with the source file name; a name
+    collision found while executing the plan can still add a "_<n>"
+    suffix. Plans can be exported to CSV, loaded back and diffed.
+    """
+
+    def __init__(self, source_folder, destination_folder, organization_mode):
+        self.source_folder = source_folder
+        self.destination_folder = destination_folder
+        self.organization_mode = organization_mode
+        self.sources = []
+        self.folder_ids = array('i')
+        self.actions = array('b')
+        self.sizes = array('q')
+        self.has_stat = array('b')
+        self.mtimes_ns = array('q')
+        self.ctimes_ns = array('q')
+        self.devices = array('Q')
+        self.inodes = array('Q')
+        self.folders = []
+        self._folder_index = {}
+        # RunMetrics of the planning stages, if the plan was made by the organizer
+        self.metrics = None
+        # ScanJournal of an incremental scan, updated after the plan runs
+        self.scan_journal = None
+
+    def __len__(self):
+        return len(self.sources)
+
+    def add(self, source, dest_folder=None, action=MOVE, size=0, stat=None):
+        """Append a row; dest_folder is None for rows that are not moved.
+        
+        With a stat (FileStat or os.stat_result) the size is taken from it.
+        """
+        if dest_folder is None:
+            folder_id = -1
+        else:
+            folder_id = self._folder_index.get(dest_folder)
+            if folder_id is None:
+                folder_id = len(self.folders)
+                self._folder_index[dest_folder] = folder_id
+                self.folders.append(dest_folder)
+        self.sources.append(source)
+        self.folder_ids.append(folder_id)
+        self.actions.append(action)
+        if stat is None:
+            self.sizes.append(size)
+            self.has_stat.append(0)
+            self.mtimes_ns.append(0)
+            self.ctimes_ns.append(0)
+            self.devices.append(0)
+            self.inodes.append(0)
+        else:
+            self.sizes.append(stat.st_size)
+            self.has_stat.append(1)
+            self.mtimes_ns.append(stat.st_mtime_ns)
+            self.ctimes_ns.append(stat.st_ctime_ns)
+            self.devices.append(stat.st_dev)
+            self.inodes.append(stat.st_ino)
+
+    def destination(self, index):
+        """Planned destination path of a row, or "" if it is not moved"""
+        folder_id = self.folder_ids[index]
+        if folder_id < 0:
+            return ""
+        return os.path.join(self.folders[folder_id], os.path.basename(self.sources[index]))
+
+    def stat(self, index):
+        """FileStat recorded for a row when it was planned, or None"""
+        if not self.has_stat[index]:
+            return None
+        return FileStat(self.sizes[index], self.mtimes_ns[index], self.ctimes_ns[index],
+                        self.devices[index], self.inodes[index])
+
+    def row(self, index):
+        """(source, destination, action, size) of a row"""
+        return (self.sources[index], self.destination(index),
+                ACTIONS[self.actions[index]], self.sizes[index])
+
+    def rows(self, start=0, stop=None):
+        """Yield rows from start to stop"""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for index in range(start, stop):
+            yield self.row(index)
+
+    def summary(self):
+        """Files and bytes per action"""
+        actions = np.frombuffer(self.actions, dtype=np.int8) if len(self) else np.zeros(0, np.int8)
+        sizes = np.frombuffer(self.sizes, dtype=np.int64) if len(self) else np.zeros(0, np.int64)
+        files = np.bincount(actions, minlength=len(ACTIONS))
+        total = np.bincount(actions, weights=np.maximum(sizes, 0), minlength=len(ACTIONS))
+        return {action: {"files": int(files[i]), "bytes": int(total[i])}
+                for i, action in enumerate(ACTIONS)}
+
+    def destination_folders(self):
+        """Distinct folders that moved files go to"""
+        used = {folder_id for folder_id, action in zip(self.folder_ids, self.actions) if action == MOVE}
+        return [self.folders[folder_id] for folder_id in sorted(used)]
+
+    def move_tasks(self):
+        """(source, destination, stat) of all moves, grouped by destination
+        folder and in plan order within a folder"""
+        by_folder = {}
+        for index, (folder_id, action) in enumerate(zip(self.folder_ids, self.actions)):
+            if action == MOVE:
+                by_folder.setdefault(folder_id, []).append(index)
+        for folder_id, indexes in by_folder.items():
+            folder = self.folders[folder_id]
+            for index in indexes:
+                source = self.sources[index]
+                yield source, os.path.join(folder, os.path.basename(source)), self.stat(index)
+
+    def export_csv(self, path):
+        """Write the plan as CSV with a header row"""
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(("source", "destination", "action", "size"))
+            writer.writerows(self.rows())
+
+    @classmethod
+    def load_csv(cls, path, source_folder=None, destination_folder=None, organization_mode=None):
+        """Read a plan written by export_csv"""
+        plan = cls(source_folder, destination_folder, organization_mode)
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for source, destination, action, size in reader:
+                plan.add(source, os.path.dirname(destination) if destination else None,
+                         ACTIONS.index(action), int(size))
+        return plan
+
+    def diff(self, other):
+        """Compare with another plan by source path.
+
+        Returns {"added": [...], "removed": [...], "changed": [...]} where
+        added and removed hold rows only in other or only in this plan, and
+        changed holds (source, old destination, new destination, old action,
+        new action) for sources planned differently.
+        """
+        mine = {source: index for index, source in enumerate(self.sources)}
+        theirs = {source: index for index, source in enumerate(other.sources)}
+        added = [other.row(theirs[source]) for source in other.sources if source not in mine]
+        removed = [self.row(mine[source]) for source in self.sources if source not in theirs]
+        changed = []
+        for source, index in mine.items():
+            other_index = theirs.get(source)
+            if other_index is None:
+                continue
+            old, new = self.row(index), other.row(other_index)
+            if old[1] != new[1] or old[2] != new[2]:
+                changed.append((source, old[1], new[1], old[2], new[2]))
+        return {"added": added, "removed": removed, "changed": changed}
@@ -0,0 +1,127 @@
+import time
+from collections import namedtuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Stages of an organize run, in order
+SCAN_STAGE, PLAN_STAGE, MOVE_STAGE, DONE_STAGE = "scan", "plan", "move", "done"
+
+# A progress snapshot. files_total and bytes_total are the planned moves and
+# are 0 until planning finished; eta is in seconds, None while unknown;
+# stats is set on the final "done" event only.
+ProgressEvent = namedtuple('ProgressEvent', 'stage files_scanned files_planned files_done files_total '
+                                            'bytes_done bytes_total elapsed eta stats')
+
+
+class ProgressTracker:
+    """Counts the progress of an organize run and reports it to a callback.
+
+    The organizer updates the counters once per file. The callback gets a
+    ProgressEvent at most every `interval` seconds, plus one at every stage
+    change and a final "done" event, so consumers see a steady event rate
+    however many files there are. Without a callback every update is a
+    no-op.
+    """
+
+    def __init__(self, callback=None, interval=0.1):
+        self.callback = callback
+        self.interval = interval
+        self.stage = SCAN_STAGE
+        self.files_scanned = 0
+        self.files_planned = 0
+        self.files_done = 0
+        self.files_total = 0
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self._start = time.monotonic()
+        self._move_start = None
+        self._last_emit = 0.0
+
+    @classmethod
+    def wrap(cls, progress, interval=0.1):
+        """A tracker for a progress= argument: a tracker, a callback or None"""
+        if isinstance(progress, cls):
+            return progress
+        return cls(progress, interval)
+
+    def set_stage(self, stage, files_total=None, bytes_total=None):
+        if self.callback is None:
+            return
+        self.stage = stage
+        if files_total is not None:
+            self.files_total = files_total
+        if bytes_total is not None:
+            self.bytes_total = bytes_total
+        if stage == MOVE_STAGE:
+            self._move_start = time.monotonic()
+        self.emit()
+
+    def scanned(self, count=1):
+        if self.callback is None:
+            return
+        self.files_scanned += count
+        self._maybe_emit()
+
+    def planned(self, count=1):
+        if self.callback is None:
+            return
+        self.files_planned += count
+        self._maybe_emit()
+
+    def done(self, count=1, size=0):
+        if self.callback is None:
+            return
+        self.files_done += count
+        self.bytes_done += size
+        self._maybe_emit()
+
+    def finish(self, stats):
+        """Send the final "done" event with the run statistics"""
+        if self.callback is None:
+            return
+        self.stage = DONE_STAGE
+        self.emit(stats)
+
+    def _maybe_emit(self):
+        if time.monotonic() - self._last_emit >= self.interval:
+            self.emit()
+
+    def eta(self):
+        """Seconds left in the move stage from its byte (or file) rate"""
+        if self.stage != MOVE_STAGE or self._move_start is None:
+            return 0.0 if self.stage == DONE_STAGE else None
+        elapsed = time.monotonic() - self._move_start
+        if self.bytes_total and self.bytes_done:
+            return elapsed * (self.bytes_total - self.bytes_done) / self.bytes_done
+        if self.files_total and self.files_done:
+            return elapsed * (self.files_total - self.files_done) / self.files_done
+        return None
+
+    def snapshot(self, stats=None):
+        return ProgressEvent(self.stage, self.files_scanned, self.files_planned, self.files_done,
+                             self.files_total, self.bytes_done, self.bytes_total,
+                             time.monotonic() - self._start, self.eta(), stats)
+
+    def emit(self, stats=None):
+        self._last_emit = time.monotonic()
+        try:
+            self.callback(self.snapshot(stats))
+        except Exception as e:
+            # A broken progress consumer must not fail the run
+            logger.warning(f"Progress callback failed: {e}")
+
+
+def format_progress(event):
+    """One-line description of a ProgressEvent"""
+    if event.stage == SCAN_STAGE:
+        return f"Scanning: {event.files_scanned} files found"
+    if event.stage == PLAN_STAGE:
+        return f"Planning: {event.files_planned}/{event.files_scanned} files"
+    if event.stage == MOVE_STAGE:
+        text = (f"Moving: {event.files_done}/{event.files_total} files, "
+                f"{event.bytes_done / (1024 * 1024):.1f}/{event.bytes_total / (1024 * 1024):.1f} MB")
+        if event.eta is not None:
+            text += f", about {event.eta:.0f} s left"
+        return text
+    return f"Done in {event.elapsed:.1f} s"
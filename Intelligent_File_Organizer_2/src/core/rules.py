@@ -0,0 +1,158 @@
+import os
+import re
+import fnmatch
+from bisect import bisect_right
+from datetime import datetime
+import logging
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+class RuleEngine:
+    """Destination rules compiled from config.json.
+
+    The configuration is compiled once into lookup structures so a file's
+    destination folder is found without scanning the configuration:
+
+    - "folders": a hash map from extension to category
+    - "size_categories": sorted size thresholds, searched with bisect
+    - date buckets: cached "<year>/<month>-<Month>" folder names
+    - "custom_rules": name rules combined into as few regular expressions
+      as their groups allow
+
+    Custom rules are checked before the organization mode and look like
+    {"pattern": "invoice*.pdf", "folder": "invoices", "priority": 10} or
+    {"regex": "^IMG_\\d+", "folder": "camera"}. "pattern" is a glob
+    matched against the whole file name, "regex" is searched in the name.
+    Rules with a higher priority win; ties keep their order in the config.
+    Matching is case-insensitive unless the rule sets "case_sensitive".
+    """
+
+    def __init__(self, config):
+        self.extension_map = self._compile_extensions(config.get("folders", {}))
+        self.size_thresholds, self.size_folders = self._compile_sizes(config.get("size_categories", {}))
+        self.name_rules = self._compile_name_rules(config.get("custom_rules", []))
+        self._date_folders = {}
+
+    def _compile_extensions(self, folders):
+        """Map each extension to the first category that lists it"""
+        extension_map = {}
+        for category, extensions in folders.items():
+            for ext in extensions:
+                extension_map.setdefault(ext.lower(), category)
+        return extension_map
+
+    def _compile_sizes(self, size_categories):
+        """Sort size categories by their upper bound in bytes"""
+        bounded = []
+        fallback = "very_large_files"
+        for name, category in size_categories.items():
+            folder_name = category.get("folder_name", f"{name}_files")
+            if "max_size_mb" in category:
+                bounded.append((category["max_size_mb"] * MB, folder_name))
+            else:
+                fallback = folder_name
+        bounded.sort(key=lambda item: item[0])
+        return [limit for limit, _ in bounded], [folder for _, folder in bounded] + [fallback]
+
+    def _compile_name_rules(self, rules):
+        """Compile custom name rules into matchers, highest priority first.
+
+        Consecutive rules without groups are combined into one pattern with
+        a named group per rule. A regex with its own groups is matched on
+        its own, since wrapping it would renumber its backreferences and
+        clash with group names of other rules. Returns a list of
+        (pattern, folders); for a combined pattern the lastgroup "r<n>" of
+        a match indexes folders.
+        """
+        ordered = sorted(enumerate(rules), key=lambda item: (-item[1].get("priority", 0), item[0]))
+        matchers = []
+        alternatives = []
+        folders = []
+
+        def combine():
+            if not alternatives:
+                return
+            try:
+                matchers.append((re.compile("|".join(alternatives), re.DOTALL), list(folders)))
+            except re.error as e:
+                logger.warning(f"Could not combine custom rules, matching them one by one: {e}")
+                for expression, folder in zip(alternatives, folders):
+                    matchers.append((re.compile(expression, re.DOTALL), [folder]))
+            alternatives.clear()
+            folders.clear()
+
+        for _, rule in ordered:
+            if "pattern" in rule:
+                expression = fnmatch.translate(rule["pattern"])
+            elif "regex" in rule:
+                expression = f".*?(?:{rule['regex']})"
+            else:
+                logger.warning(f"Ignoring custom rule without pattern or regex: {rule}")
+                continue
+            flags = re.DOTALL if rule.get("case_sensitive", False) else re.DOTALL | re.IGNORECASE
+            try:
+                compiled = re.compile(expression, flags)
+            except re.error as e:
+                logger.warning(f"Ignoring invalid custom rule {rule}: {e}")
+                continue
+            if compiled.groups:
+                combine()
+                matchers.append((compiled, [rule["folder"]]))
+                continue
+            if not rule.get("case_sensitive", False):
+                expression = f"(?i:{expression})"
+            alternatives.append(f"(?P<r{len(folders)}>{expression})")
+            folders.append(rule["folder"])
+
+        combine()
+        return matchers
+
+    def match_name(self, file_name):
+        """Return the folder of the first custom rule matching a name, if any"""
+        for pattern, folders in self.name_rules:
+            match = pattern.match(file_name)
+            if match is None:
+                continue
+            if len(folders) == 1:
+                return folders[0]
+            return folders[int(match.lastgroup[1:])]
+        return None
+
+    def by_type(self, file_name):
+        """Folder for a file name based on its extension"""
+        ext = os.path.splitext(file_name)[1].lower()
+        category = self.extension_map.get(ext)
+        if category:
+            return category
+        return f"{ext[1:]}_files" if ext else "no_extension"
+
+    def by_size(self, file_size):
+        """Folder for a file size in bytes"""
+        return self.size_folders[bisect_right(self.size_thresholds, file_size)]
+
+    def by_date(self, mtime):
+        """Year/month folder for a modification timestamp"""
+        mod_time = datetime.fromtimestamp(mtime)
+        key = (mod_time.year, mod_time.month)
+        folder = self._date_folders.get(key)
+        if folder is None:
+            folder = os.path.join(str(mod_time.year), f"{mod_time.month:02d}-{mod_time.strftime('%B')}")
+            self._date_folders[key] = folder
+        return folder
+
+    def resolve(self, file_name, file_stat, organization_mode):
+        """Folder for a file relative to the destination, or None if the
+        mode is not rule based (e.g. "ai")"""
+        folder = self.match_name(file_name)
+        if folder is not None:
+            return folder
+        if organization_mode == "type":
+            return self.by_type(file_name)
+        if organization_mode == "size":
+            return self.by_size(file_stat.st_size)
+        if organization_mode == "date":
+            return self.by_date(file_stat.st_mtime)
+        return None
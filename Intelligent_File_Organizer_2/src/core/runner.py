@@ -0,0 +1,295 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import subprocess
+import argparse
+from datetime import datetime
+import logging
+
+# Try to import psutil for priorities on every platform
+PSUTIL_SUPPORT = False
+try:
+    import psutil
+    PSUTIL_SUPPORT = True
+except ImportError:
+    psutil = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_DIR = os.path.join(tempfile.gettempdir(), "file_organizer_locks")
+
+# How often a CancelFlag looks for its file
+CANCEL_CHECK_INTERVAL = 0.5
+
+# Job ID of a run_jobs run, for cancelling it
+ALL_JOBS_ID = "all"
+
+
+def _lock_path(folder, suffix):
+    name = hashlib.sha1(os.path.abspath(folder).encode()).hexdigest()[:16]
+    return os.path.join(LOCK_DIR, f"{name}.{suffix}")
+
+
+class FolderLock:
+    """Exclusive, non-blocking lock on a folder shared by all processes.
+
+    Backed by an OS file lock, so it is released when the holding process
+    dies, however it dies.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = _lock_path(folder, "lock")
+        self._file = None
+
+    def acquire(self):
+        """Take the lock; returns False if another run holds it"""
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        f = open(self.path, "a+")
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if sys.platform == "win32":
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+class CancelFlag:
+    """Cancel signal for a job in another process, kept as a file.
+
+    Has the is_set() of threading.Event, so it can be passed as cancel= to
+    the organizer. The file is looked up at most every
+    CANCEL_CHECK_INTERVAL seconds, which keeps the per-file check cheap.
+    """
+
+    def __init__(self, job_id):
+        self.path = _lock_path(job_id, "cancel")
+        self._set = False
+        self._next_check = 0.0
+
+    def set(self):
+        os.makedirs(LOCK_DIR, exist_ok=True)
+        with open(self.path, "w"):
+            pass
+        self._set = True
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self._set = False
+
+    def is_set(self):
+        if not self._set and time.monotonic() >= self._next_check:
+            self._set = os.path.exists(self.path)
+            self._next_check = time.monotonic() + CANCEL_CHECK_INTERVAL
+        return self._set
+
+
+def apply_limits(nice=None, io_priority=None, memory_limit_mb=None):
+    """Lower the priority and cap the memory of the current process.
+
+    nice is a POSIX niceness increment (below normal priority on Windows),
+    io_priority is "idle" or "low" and memory_limit_mb caps the address
+    space (POSIX only). Limits a platform cannot apply are logged and
+    skipped. Meant as a worker process initializer.
+    """
+    if nice:
+        try:
+            if PSUTIL_SUPPORT and sys.platform == "win32":
+                psutil.Process().nice(psutil.BELOW_NORMAL_PRIORITY_CLASS)
+            else:
+                os.nice(nice)
+        except (AttributeError, OSError) as e:
+            logger.warning(f"Could not lower CPU priority: {e}")
+
+    if io_priority:
+        _set_io_priority(io_priority)
+
+    if memory_limit_mb:
+        try:
+            import resource
+            limit = int(memory_limit_mb) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e:
+            logger.warning(f"Could not cap memory at {memory_limit_mb} MB: {e}")
+
+
+def _set_io_priority(io_priority):
+    if PSUTIL_SUPPORT:
+        try:
+            process = psutil.Process()
+            if sys.platform == "win32":
+                process.ionice(psutil.IOPRIO_VERYLOW if io_priority == "idle" else psutil.IOPRIO_LOW)
+            elif hasattr(psutil, "IOPRIO_CLASS_IDLE"):
+                if io_priority == "idle":
+                    process.ionice(psutil.IOPRIO_CLASS_IDLE)
+                else:
+                    process.ionice(psutil.IOPRIO_CLASS_BE, value=7)
+            return
+        except (AttributeError, OSError, psutil.Error) as e:
+            logger.warning(f"Could not lower I/O priority: {e}")
+            return
+
+    # Linux without psutil: util-linux ionice
+    ionice = shutil.which("ionice") if sys.platform.startswith("linux") else None
+    if ionice is None:
+        logger.warning("Lowering I/O priority needs psutil on this platform")
+        return
+    args = ["-c", "3"] if io_priority == "idle" else ["-c", "2", "-n", "7"]
+    result = subprocess.run([ionice] + args + ["-p", str(os.getpid())], capture_output=True)
+    if result.returncode != 0:
+        logger.warning(f"Could not lower I/O priority: {result.stderr.decode().strip()}")
+
+
+def run_job(job_info):
+    """Run one scheduled organize job and return its outcome.
+
+    Runs in a scheduler worker process. The job's folder is locked for the
+    whole run; if another run holds it the job is skipped. An unfinished
+    run of the folder is resumed first. Returns {"status", "stats",
+    "finished"} with status "completed", "cancelled" or "skipped".
+    """
+    from .organizer import SmartOrganizer
+
+    lock = FolderLock(job_info['folder'])
+    if not lock.acquire():
+        logger.info(f"Skipping job {job_info['id']}: {job_info['folder']} is being organized")
+        return {"status": "skipped", "stats": None, "finished": datetime.now().isoformat()}
+
+    cancel = CancelFlag(job_info['id'])
+    organizer = None
+    try:
+        organizer = SmartOrganizer()
+        logger.info(f"Running scheduled job {job_info['id']} in process {os.getpid()}")
+        stats = None
+
+        # Finish a run of this folder that was interrupted or cancelled
+        run_id = organizer.journal.resumable_run(job_info['folder'])
+        if run_id is not None:
+            stats = organizer.resume_run(run_id, cancel=cancel)
+            logger.info(f"Resumed run {run_id} of job {job_info['id']}: {stats}")
+
+        if not cancel.is_set():
+            stats = organizer.organize_folder(
+                job_info['folder'],
+                incremental=job_info.get('incremental', True),
+                cancel=cancel
+            )
+        status = "cancelled" if cancel.is_set() else "completed"
+        if stats is not None:
+            # Keep the result small; the metrics are in the runs table
+            stats = {key: value for key, value in stats.items() if key != "metrics"}
+        return {"status": status, "stats": stats, "finished": datetime.now().isoformat()}
+    finally:
+        # Pool workers are reused, so a failed run must not keep connections
+        # or extraction workers open, or lose buffered journal and analytics rows
+        if organizer is not None:
+            organizer.close()
+        cancel.clear()
+        lock.release()
+
+
+def run_jobs(jobs):
+    """Run several scheduled jobs as one organize_roots run.
+
+    Folders are scheduled by device (see SmartOrganizer.organize_roots).
+    Folders another run holds are skipped; unfinished runs of the others
+    are resumed first. Returns {"status", "stats", "finished", "skipped"},
+    where skipped lists the IDs of the skipped jobs.
+    """
+    from .organizer import SmartOrganizer
+
+    locks, skipped = [], []
+    for job_info in jobs:
+        lock = FolderLock(job_info['folder'])
+        if lock.acquire():
+            locks.append(lock)
+        else:
+            logger.info(f"Skipping job {job_info['id']}: {job_info['folder']} is being organized")
+            skipped.append(job_info['id'])
+    if not locks:
+        return {"status": "skipped", "stats": None, "finished": datetime.now().isoformat(),
+                "skipped": skipped}
+
+    cancel = CancelFlag(ALL_JOBS_ID)
+    organizer = None
+    try:
+        organizer = SmartOrganizer()
+        folders = [lock.folder for lock in locks]
+        logger.info(f"Running {len(folders)} scheduled jobs in process {os.getpid()}")
+        for folder in folders:
+            run_id = organizer.journal.resumable_run(folder)
+            if run_id is not None and not cancel.is_set():
+                organizer.resume_run(run_id, cancel=cancel)
+
+        stats = None
+        if not cancel.is_set():
+            incremental = all(job_info.get('incremental', True) for job_info in jobs)
+            stats = organizer.organize_roots(folders, incremental=incremental, cancel=cancel)
+            for root_stats in stats["roots"].values():
+                root_stats.pop("metrics", None)
+        status = "cancelled" if cancel.is_set() else "completed"
+        return {"status": status, "stats": stats, "finished": datetime.now().isoformat(),
+                "skipped": skipped}
+    finally:
+        # Pool workers are reused, so a failed run must not keep connections
+        # or extraction workers open, or lose buffered journal and analytics rows
+        if organizer is not None:
+            organizer.close()
+        cancel.clear()
+        for lock in locks:
+            lock.release()
+
+
+def main(argv=None):
+    """Run scheduled jobs once, e.g. from the Windows Task Scheduler"""
+    parser = argparse.ArgumentParser(description="Run scheduled organize jobs")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--job-id")
+    group.add_argument("--all", action="store_true",
+                       help="Run every timed job as one run, scheduled by device")
+    parser.add_argument("--jobs-file", default="scheduled_jobs.json")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    with open(args.jobs_file) as f:
+        jobs = json.load(f)
+    if args.all:
+        result = run_jobs([job_info for job_info in jobs.values() if job_info['schedule_type'] != 'watch'])
+    elif args.job_id not in jobs:
+        parser.error(f"unknown job: {args.job_id}")
+    else:
+        result = run_job(jobs[args.job_id])
+    print(json.dumps(result, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Directories modified this recently are relisted on the next scan, since a
+# change within the same mtime tick would not be visible
+RACY_WINDOW_NS = 2 * 10**9
+
+
+class ScanJournal:
+    """Per-root journal of the last scan, used for incremental organizing.
+
+    For every directory under a root the journal keeps its mtime and a
+    listing of its files (size, mtime) and subdirectories. A directory whose
+    mtime is unchanged is not listed again, so a scan of an unchanged tree
+    costs one stat per directory. Files modified in place without touching
+    their directory are picked up the next time that directory is listed.
+
+    The journal saved after a run is the scan the run was planned from,
+    with the run's failed files marked as changed, so nothing that was not
+    organized is recorded as seen.
+    """
+
+    def __init__(self, db_path="file_organizer.db"):
+        self.db_path = db_path
+        self._state = {}
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the scan journal table"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS scan_journal (
+                root TEXT,
+                directory TEXT,
+                mtime_ns INTEGER,
+                entries TEXT,
+                PRIMARY KEY (root, directory)
+            )
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    def load(self, root):
+        """Load the journal of the last scan of root"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute(
+            'SELECT directory, mtime_ns, entries FROM scan_journal WHERE root = ?',
+            (os.path.abspath(root),)
+        )
+        state = {}
+        for directory, mtime_ns, entries in cursor.fetchall():
+            entries = json.loads(entries)
+            state[directory] = {
+                'mtime_ns': mtime_ns,
+                'files': entries['files'],
+                'dirs': entries['dirs']
+            }
+        conn.close()
+        return state
+
+    def save(self, root, state):
+        """Replace the journal of root with a new scan state"""
+        root = os.path.abspath(root)
+        rows = [
+            (root, directory, entry['mtime_ns'],
+             json.dumps({'files': entry['files'], 'dirs': entry['dirs']}))
+            for directory, entry in state.items()
+        ]
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute('DELETE FROM scan_journal WHERE root = ?', (root,))
+            conn.executemany('''
+                INSERT INTO scan_journal (root, directory, mtime_ns, entries)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+        conn.close()
+
+    def scan(self, root, include_subfolders, previous=None):
+        """Scan root, reusing listings of directories that did not change.
+
+        Returns (state, changed) where changed lists the paths of files that
+        appeared or changed size/mtime since the previous state.
+        """
+        previous = previous or {}
+        state = {}
+        changed = []
+        now_ns = time.time_ns()
+        stack = [os.path.abspath(root)]
+
+        while stack:
+            directory = stack.pop()
+            try:
+                st = os.stat(directory)
+            except OSError as e:
+                logger.warning(f"Cannot scan {directory}: {e}")
+                continue
+
+            prev = previous.get(directory)
+            if prev and prev['mtime_ns'] is not None and prev['mtime_ns'] == st.st_mtime_ns:
+                entry = prev
+            else:
+                entry = self._list_directory(directory, st, now_ns)
+                old_files = prev['files'] if prev else {}
+                for name, signature in entry['files'].items():
+                    if old_files.get(name) != signature:
+                        changed.append(os.path.join(directory, name))
+
+            state[directory] = entry
+            if include_subfolders:
+                stack.extend(os.path.join(directory, name) for name in reversed(entry['dirs']))
+
+        return state, changed
+
+    def _list_directory(self, directory, dir_stat, now_ns):
+        """List one directory into a journal entry"""
+        files = {}
+        dirs = []
+        try:
+            with os.scandir(directory) as it:
+                for item in it:
+                    try:
+                        if item.is_dir(follow_symlinks=False):
+                            dirs.append(item.name)
+                        elif item.is_file():
+                            item_stat = item.stat()
+                            files[item.name] = [item_stat.st_size, item_stat.st_mtime_ns]
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"Cannot list {directory}: {e}")
+
+        # Don't trust an mtime that may still change within the same tick
+        mtime_ns = dir_stat.st_mtime_ns
+        if now_ns - mtime_ns < RACY_WINDOW_NS:
+            mtime_ns = None
+
+        return {'mtime_ns': mtime_ns, 'files': files, 'dirs': sorted(dirs)}
+
+    def changed_files(self, root, include_subfolders):
+        """Return files under root that appeared or changed since the last scan"""
+        previous = self.load(root)
+        self._state, changed = self.scan(root, include_subfolders, previous)
+        return sorted(changed)
+
+    def mark_moved(self, destination, stat):
+        """Record a file a run moved into a scanned directory, so the next
+        scan does not report it as changed"""
+        entry = self._directory_entry(os.path.dirname(os.path.abspath(destination)))
+        if entry is not None:
+            entry['files'][os.path.basename(destination)] = [stat.st_size, stat.st_mtime_ns]
+
+    def _directory_entry(self, directory):
+        """State entry of a directory, added (to be relisted) if it is new
+        under a scanned one, or None outside the scanned tree"""
+        entry = self._state.get(directory)
+        if entry is not None:
+            return entry
+        parent_dir = os.path.dirname(directory)
+        if parent_dir == directory:
+            return None
+        parent = self._directory_entry(parent_dir)
+        if parent is None:
+            return None
+        name = os.path.basename(directory)
+        if name not in parent['dirs']:
+            parent['dirs'] = sorted(parent['dirs'] + [name])
+        entry = {'mtime_ns': None, 'files': {}, 'dirs': []}
+        self._state[directory] = entry
+        return entry
+
+    def mark_changed(self, path):
+        """Make the next scan report a file again, e.g. after it failed"""
+        entry = self._state.get(os.path.dirname(os.path.abspath(path)))
+        if entry is not None:
+            entry['files'].pop(os.path.basename(path), None)
+            entry['mtime_ns'] = None
+
+    def commit(self, root):
+        """Record the scan behind changed_files as the last scan of root.
+
+        Files that appeared while the run was going on are not in it, so
+        the next scan still reports them.
+        """
+        self.save(root, self._state)
@@ -1,8 +1,11 @@
 import schedule
-import time
 import threading
 import json
 import os
+import sys
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 import logging
 import platform
@@ -16,16 +19,61 @@ if platform.system() == "Windows":
     except ImportError:
         logging.warning("pywin32 not available, Windows Task Scheduler features disabled")
 
+from .watcher import get_folder_watcher
+
 logger = logging.getLogger(__name__)
 
+# Upper bound on how long the scheduler thread sleeps between checks
+MAX_IDLE_SECONDS = 60
+
+# Defaults of the "scheduler" section of config.json
+SCHEDULER_DEFAULTS = {
+    "max_concurrent_jobs": 2,
+    "nice": 10,
+    "io_priority": "idle",
+    "memory_limit_mb": None
+}
+
 class ScheduleManager:
-    def __init__(self):
+    """Runs organize jobs on a timer or on folder changes.
+
+    Timed jobs run in a pool of worker processes, so a slow job neither
+    blocks the scheduler thread nor the other jobs, and the workers can run
+    at a lower CPU/IO priority with a memory cap. At most
+    max_concurrent_jobs run at once, and a job whose folder is still being
+    organized is skipped.
+    """
+
+    def __init__(self, config_path="config.json"):
         self.scheduled_jobs = {}
         self.running = False
         self.scheduler_thread = None
+        self.watcher = get_folder_watcher()
+        self._wake_event = threading.Event()
+        self.config = self._load_config(config_path)
+        self._pool = None
+        # Futures of submitted pool runs, cancelled by hand on stop() before
+        # Python 3.9
+        self._futures = set()
+        # Guards scheduled_jobs, _running_jobs and the jobs file, which the
+        # pool's result callbacks update too
+        self._jobs_lock = threading.RLock()
+        # job ID -> folders of its running organize
+        self._running_jobs = {}
         self.jobs_file = "scheduled_jobs.json"
         self._load_jobs()
     
+    def _load_config(self, config_path):
+        """Load the "scheduler" section of config.json"""
+        config = dict(SCHEDULER_DEFAULTS)
+        if os.path.exists(config_path):
+            try:
+                with open(config_path, 'r') as f:
+                    config.update(json.load(f).get("scheduler", {}))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Could not read scheduler settings from {config_path}: {e}")
+        return config
+    
     def _load_jobs(self):
         """Load scheduled jobs from file"""
         if os.path.exists(self.jobs_file):
@@ -37,7 +85,7 @@ class ScheduleManager:
     
     def _save_jobs(self):
         """Save scheduled jobs to file"""
-        with open(self.jobs_file, 'w') as f:
+        with self._jobs_lock, open(self.jobs_file, 'w') as f:
             json.dump(self.scheduled_jobs, f, indent=2)
     
     def add_schedule(self, job_id, folder_path, schedule_type, time_value=None):
@@ -50,11 +98,12 @@ class ScheduleManager:
             "created_at": datetime.now().isoformat(),
             "last_run": None,
             "next_run": None,
-            "status": "active"
+            "status": "active",
+            "incremental": True
         }
         
         # Add to Windows Task Scheduler if on Windows and available
-        if WINDOWS_SUPPORT:
+        if WINDOWS_SUPPORT and schedule_type != 'watch':
             self._add_windows_task(job_id, folder_path, schedule_type, time_value)
         
         # Add to internal scheduler
@@ -75,6 +124,8 @@ class ScheduleManager:
             
             # Remove from internal scheduler
             schedule.clear(job_id)
+            if self.scheduled_jobs[job_id]['schedule_type'] == 'watch':
+                self.watcher.unwatch(self.scheduled_jobs[job_id]['folder'])
             
             del self.scheduled_jobs[job_id]
             self._save_jobs()
@@ -83,6 +134,17 @@ class ScheduleManager:
             return True
         return False
     
+    def cancel_job(self, job_id):
+        """Stop the running organize of a job at its next file; it resumes
+        on the job's next run. Returns False if the job is not running"""
+        if job_id not in self._running_jobs:
+            return False
+        # Imported here so src.core.runner can also run as a script
+        from .runner import CancelFlag
+        CancelFlag(job_id).set()
+        logger.info(f"Cancelling job {job_id}")
+        return True
+    
     def list_schedules(self):
         """List all scheduled jobs"""
         return list(self.scheduled_jobs.values())
@@ -109,6 +171,7 @@ class ScheduleManager:
             
             # Update internal scheduler
             schedule.clear(job_id)
+            self.watcher.unwatch(job_info["folder"])
             self._add_internal_schedule(job_info)
             
             self._save_jobs()
@@ -117,22 +180,13 @@ class ScheduleManager:
     
     def _add_internal_schedule(self, job_info):
         """Add job to internal scheduler"""
-        # Import here to avoid circular imports
-        from .organizer import SmartOrganizer
-        
         def job_function():
-            try:
-                organizer = SmartOrganizer()
-                logger.info(f"Running scheduled job {job_info['id']}")
-                stats = organizer.organize_folder(job_info['folder'])
-                job_info['last_run'] = datetime.now().isoformat()
-                job_info['status'] = 'completed'
-                self._save_jobs()
-                logger.info(f"Completed job {job_info['id']}: {stats}")
-            except Exception as e:
-                logger.error(f"Error in job {job_info['id']}: {e}")
-                job_info['status'] = 'error'
-                self._save_jobs()
+            self._submit_job(job_info)
+        
+        # Watched folders are organized on file events instead of a timer
+        if job_info['schedule_type'] == 'watch':
+            self.watcher.watch(job_info['folder'])
+            return
         
         # Schedule based on type
         if job_info['schedule_type'] == 'daily':
@@ -144,6 +198,137 @@ class ScheduleManager:
             schedule.every().hour.do(job_function).tag(job_info['id'])
         elif job_info['schedule_type'] == 'minutes':
             schedule.every(int(job_info['time_value'])).minutes.do(job_function).tag(job_info['id'])
+        
+        # Let the scheduler thread pick up the new next run time
+        self._wake_event.set()
+    
+    def _get_pool(self):
+        """The worker process pool, started on first use"""
+        from .runner import apply_limits
+        if self._pool is None:
+            # spawn keeps the workers free of the GUI's threads and Qt state
+            self._pool = ProcessPoolExecutor(
+                max_workers=max(1, int(self.config["max_concurrent_jobs"])),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=apply_limits,
+                initargs=(self.config["nice"], self.config["io_priority"],
+                          self.config["memory_limit_mb"])
+            )
+        return self._pool
+    
+    def _submit_job(self, job_info):
+        """Hand a job to the worker pool and return at once.
+
+        The job is skipped if it is still running or another job is
+        organizing the same folder. Jobs beyond max_concurrent_jobs wait in
+        the pool's queue.
+        """
+        from .runner import run_job, CancelFlag
+        job_id = job_info['id']
+        with self._jobs_lock:
+            if job_id in self._running_jobs or self._is_busy(job_info):
+                logger.info(f"Skipping job {job_id}: {job_info['folder']} is still being organized")
+                return
+            self._running_jobs[job_id] = [os.path.abspath(job_info['folder'])]
+            job_info['status'] = 'running'
+        # A leftover flag from an earlier cancel must not stop this run
+        CancelFlag(job_id).clear()
+        try:
+            future = self._get_pool().submit(run_job, dict(job_info))
+        except RuntimeError as e:
+            # The pool is shut down or broken; start a new one next time
+            logger.error(f"Could not start job {job_id}: {e}")
+            self._pool = None
+            self._job_done(job_info, None, e)
+            return
+        logger.info(f"Submitted scheduled job {job_id}")
+        self._futures.add(future)
+        future.add_done_callback(lambda f: self._job_future_done(job_info, f))
+    
+    def run_all_jobs(self, job_ids=None):
+        """Run the timed jobs (default: all) now as one coordinated run.
+
+        The folders are organized with SmartOrganizer.organize_roots in a
+        worker process: grouped by storage device, each device with its
+        own concurrency budget, all devices in parallel. Jobs whose folder
+        is being organized are left out. Cancel it with
+        cancel_job(runner.ALL_JOBS_ID). Returns the IDs of the jobs run.
+        """
+        from .runner import run_jobs, CancelFlag, ALL_JOBS_ID
+        with self._jobs_lock:
+            if ALL_JOBS_ID in self._running_jobs:
+                logger.info("Skipping run of all jobs: the previous one is still running")
+                return []
+            jobs = [job_info for job_id, job_info in self.scheduled_jobs.items()
+                    if (job_ids is None or job_id in job_ids)
+                    and job_info['schedule_type'] != 'watch'
+                    and job_id not in self._running_jobs and not self._is_busy(job_info)]
+            if not jobs:
+                return []
+            self._running_jobs[ALL_JOBS_ID] = [os.path.abspath(job_info['folder']) for job_info in jobs]
+            for job_info in jobs:
+                job_info['status'] = 'running'
+        CancelFlag(ALL_JOBS_ID).clear()
+        try:
+            future = self._get_pool().submit(run_jobs, [dict(job_info) for job_info in jobs])
+        except RuntimeError as e:
+            logger.error(f"Could not start the run of all jobs: {e}")
+            self._pool = None
+            self._jobs_done(jobs, None, e)
+            return []
+        logger.info(f"Submitted a run of {len(jobs)} jobs")
+        self._futures.add(future)
+        future.add_done_callback(lambda f: self._job_future_done(jobs, f))
+        return [job_info['id'] for job_info in jobs]
+    
+    def _is_busy(self, job_info):
+        """Whether a submitted run is organizing the job's folder"""
+        folder = os.path.abspath(job_info['folder'])
+        return any(folder in folders for folders in self._running_jobs.values())
+    
+    def _job_future_done(self, job_info, future):
+        """Record the outcome of a pool run of one job, or of a list of
+        jobs run together"""
+        self._futures.discard(future)
+        done = self._job_done if isinstance(job_info, dict) else self._jobs_done
+        if future.cancelled():
+            done(job_info, {"status": "cancelled", "stats": None,
+                            "finished": datetime.now().isoformat()}, None)
+        else:
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool):
+                # A worker died, e.g. at its memory cap; start a new pool next time
+                self._pool = None
+            done(job_info, None if error else future.result(), error)
+    
+    def _job_done(self, job_info, result, error, running_id=None):
+        """Record the outcome of a job run by the pool"""
+        with self._jobs_lock:
+            self._running_jobs.pop(running_id or job_info['id'], None)
+            if error is not None:
+                logger.error(f"Error in job {job_info['id']}: {error}")
+                job_info['status'] = 'error'
+            elif result['status'] == 'skipped':
+                job_info['status'] = 'skipped'
+            else:
+                job_info['last_run'] = result['finished']
+                job_info['status'] = result['status']
+                logger.info(f"Finished job {job_info['id']} ({result['status']}): {result['stats']}")
+            if job_info['id'] in self.scheduled_jobs:
+                self._save_jobs()
+    
+    def _jobs_done(self, jobs, result, error):
+        """Record the outcome of a run_all_jobs run"""
+        from .runner import ALL_JOBS_ID
+        skipped = set(result.get('skipped', ())) if result else set()
+        for job_info in jobs:
+            job_result = result
+            if job_info['id'] in skipped:
+                job_result = dict(result, status='skipped')
+            elif result and result['stats']:
+                # Only this job's folder
+                job_result = dict(result, stats=result['stats']['roots'].get(job_info['folder']))
+            self._job_done(job_info, job_result, error, running_id=ALL_JOBS_ID)
     
     def _add_windows_task(self, job_id, folder_path, schedule_type, time_value):
         """Add task to Windows Task Scheduler"""
@@ -227,17 +412,36 @@ class ScheduleManager:
             self.scheduler_thread = threading.Thread(target=self._run_scheduler)
             self.scheduler_thread.daemon = True
             self.scheduler_thread.start()
+            self.watcher.start()
             logger.info("Scheduler started")
     
     def stop(self):
-        """Stop the scheduler"""
+        """Stop the scheduler, cancelling running jobs"""
         self.running = False
+        for job_id in list(self._running_jobs):
+            self.cancel_job(job_id)
+        self._wake_event.set()
         if self.scheduler_thread:
             self.scheduler_thread.join()
+        if self._pool is not None:
+            # Cancelled jobs stop at their next checkpoint; queued ones never start
+            if sys.version_info >= (3, 9):
+                self._pool.shutdown(wait=True, cancel_futures=True)
+            else:
+                for future in list(self._futures):
+                    future.cancel()
+                self._pool.shutdown(wait=True)
+            self._pool = None
+        self.watcher.stop()
         logger.info("Scheduler stopped")
     
     def _run_scheduler(self):
         """Run the scheduler in a separate thread"""
         while self.running:
             schedule.run_pending()
-            time.sleep(1)
\ No newline at end of file
+            
+            # Sleep until the next job is due instead of polling every second
+            idle = schedule.idle_seconds()
+            timeout = MAX_IDLE_SECONDS if idle is None else min(max(idle, 0), MAX_IDLE_SECONDS)
+            self._wake_event.wait(timeout)
+            self._wake_event.clear()
\ No newline at end of file
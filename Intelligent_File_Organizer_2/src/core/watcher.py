@@ -0,0 +1,250 @@
+import os
+import time
+import fnmatch
+import threading
+import logging
+
+# Try to import watchdog (uses inotify on Linux)
+WATCHDOG_SUPPORT = False
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+    WATCHDOG_SUPPORT = True
+except ImportError:
+    FileSystemEventHandler = object
+    logging.warning("watchdog not available, folder watching falls back to polling")
+
+logger = logging.getLogger(__name__)
+
+# Temporary files written by browsers and editors while a download/save is in progress
+DEFAULT_IGNORE_PATTERNS = ["*.part", "*.crdownload", "*.download", "*.tmp", "*.partial", ".~*", "~$*"]
+
+_default_watcher = None
+_default_watcher_lock = threading.Lock()
+
+
+def get_folder_watcher():
+    """Get the process-wide FolderWatcher"""
+    global _default_watcher
+    with _default_watcher_lock:
+        if _default_watcher is None:
+            _default_watcher = FolderWatcher()
+        return _default_watcher
+
+
+class _EventHandler(FileSystemEventHandler):
+    """Forward file events of one watched folder to the FolderWatcher"""
+
+    def __init__(self, watcher, folder):
+        super().__init__()
+        self.watcher = watcher
+        self.folder = folder
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.notify(self.folder, event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.notify(self.folder, event.src_path)
+
+    def on_moved(self, event):
+        # A browser renaming "file.part" to "file" shows up as a move
+        if not event.is_directory:
+            self.watcher.notify(self.folder, event.dest_path)
+
+
+class FolderWatcher:
+    """Organize files as soon as they appear in watched folders.
+
+    File events are coalesced per path and a file is organized once no new
+    event arrived for it during the debounce delay, so bursts of writes end
+    up as a single organize call. Without watchdog, or if the inotify
+    watch cannot be set up, a folder is polled with an incremental scan.
+    """
+
+    def __init__(self, debounce=0.5, poll_interval=30, ignore_patterns=None, organizer=None):
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.ignore_patterns = ignore_patterns or DEFAULT_IGNORE_PATTERNS
+        self.organizer = organizer
+        # The flush and poll threads share one organizer, created on first use
+        self._organizer_lock = threading.Lock()
+        self._owns_organizer = False
+        self.folders = {}
+        self.running = False
+        self.observer = None
+        self._watches = {}
+        self._pending = {}
+        self._condition = threading.Condition()
+        self._flush_thread = None
+        self._poll_thread = None
+
+    def watch(self, folder, **organize_kwargs):
+        """Start watching a folder, organizing with the given options"""
+        folder = os.path.abspath(folder)
+        self.folders[folder] = organize_kwargs
+        if self.running:
+            self._schedule_folder(folder)
+        logger.info(f"Watching {folder}")
+
+    def unwatch(self, folder):
+        """Stop watching a folder"""
+        folder = os.path.abspath(folder)
+        self.folders.pop(folder, None)
+        watch = self._watches.pop(folder, None)
+        if watch is not None and self.observer is not None:
+            self.observer.unschedule(watch)
+        logger.info(f"Stopped watching {folder}")
+
+    def start(self):
+        """Start watching all registered folders"""
+        if self.running:
+            return
+        self.running = True
+
+        if WATCHDOG_SUPPORT:
+            self.observer = Observer()
+            self.observer.start()
+        for folder in list(self.folders):
+            self._schedule_folder(folder)
+
+        self._flush_thread = threading.Thread(target=self._run_flush)
+        self._flush_thread.daemon = True
+        self._flush_thread.start()
+
+        self._poll_thread = threading.Thread(target=self._run_poll)
+        self._poll_thread.daemon = True
+        self._poll_thread.start()
+        logger.info("Folder watcher started")
+
+    def stop(self):
+        """Stop watching and organize any pending files"""
+        if not self.running:
+            return
+        self.running = False
+        with self._condition:
+            self._condition.notify_all()
+
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
+            self.observer = None
+        self._watches = {}
+        for thread in (self._flush_thread, self._poll_thread):
+            if thread:
+                thread.join()
+        with self._organizer_lock:
+            if self._owns_organizer:
+                self.organizer.close()
+                self.organizer = None
+                self._owns_organizer = False
+        logger.info("Folder watcher stopped")
+
+    def _schedule_folder(self, folder):
+        """Subscribe to events of a folder, if possible"""
+        if self.observer is None:
+            return
+        recursive = self.folders[folder].get('include_subfolders', False)
+        try:
+            self._watches[folder] = self.observer.schedule(
+                _EventHandler(self, folder), folder, recursive=recursive
+            )
+        except OSError as e:
+            # e.g. the inotify watch limit was reached
+            logger.warning(f"Cannot watch {folder}, polling instead: {e}")
+
+    def _is_ignored(self, file_path):
+        """Check if a file is a temporary file that should not be organized"""
+        name = os.path.basename(file_path)
+        return any(fnmatch.fnmatch(name, pattern) for pattern in self.ignore_patterns)
+
+    def notify(self, folder, file_path):
+        """Record an event for a file; it is organized after the debounce delay"""
+        if self._is_ignored(file_path):
+            return
+        options = self.folders.get(folder)
+        if options is None:
+            return
+        # Only direct children unless subfolders are organized too
+        if not options.get('include_subfolders', False) and os.path.dirname(file_path) != folder:
+            return
+
+        with self._condition:
+            self._pending[file_path] = (folder, time.monotonic())
+            self._condition.notify()
+
+    def _run_flush(self):
+        """Organize files once their events have settled"""
+        while True:
+            with self._condition:
+                if not self.running:
+                    due = list(self._pending.items())
+                    self._pending = {}
+                else:
+                    now = time.monotonic()
+                    due = [(path, item) for path, item in self._pending.items()
+                           if now - item[1] >= self.debounce]
+                    for path, _ in due:
+                        del self._pending[path]
+                    if not due:
+                        if self._pending:
+                            oldest = min(item[1] for item in self._pending.values())
+                            timeout = max(oldest + self.debounce - now, 0.01)
+                        else:
+                            timeout = None
+                        self._condition.wait(timeout)
+                        continue
+
+            by_folder = {}
+            for path, (folder, _) in due:
+                if os.path.isfile(path):
+                    by_folder.setdefault(folder, []).append(path)
+            for folder, paths in by_folder.items():
+                self._organize(folder, files=sorted(paths))
+
+            if not self.running:
+                return
+
+    def _run_poll(self):
+        """Fallback scanner for folders without an event subscription"""
+        while self.running:
+            for folder in list(self.folders):
+                if folder not in self._watches:
+                    self._organize(folder, incremental=True)
+            with self._condition:
+                if self.running:
+                    self._condition.wait(self.poll_interval)
+
+    def _get_organizer(self):
+        """The shared organizer, created once even if both threads need it"""
+        with self._organizer_lock:
+            if self.organizer is None:
+                # Import here to avoid circular imports
+                from .organizer import SmartOrganizer
+                self.organizer = SmartOrganizer()
+                self._owns_organizer = True
+            return self.organizer
+
+    def _organize(self, folder, **kwargs):
+        """Organize files of a watched folder"""
+        options = self.folders.get(folder)
+        if options is None:
+            return
+        # A scheduled job organizing the folder gets it first; the files
+        # are picked up by the next poll
+        from .runner import FolderLock
+        lock = FolderLock(folder)
+        if not lock.acquire():
+            logger.info(f"Watched folder {folder} is being organized, skipping")
+            return
+        try:
+            organizer = self._get_organizer()
+            options = dict(options, **kwargs)
+            destination = options.pop('destination_folder', None)
+            stats = organizer.organize_folder(folder, destination, **options)
+            logger.info(f"Watched folder {folder} organized: {stats}")
+        except Exception as e:
+            logger.error(f"Error organizing watched folder {folder}: {e}")
+        finally:
+            lock.release()
@@ -1,11 +1,12 @@
 import sys
 import os
 import json
+import threading
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                            QHBoxLayout, QPushButton, QFileDialog, QTextEdit,
                            QTabWidget, QTableWidget, QTableWidgetItem, QHeaderView,
                            QMessageBox, QLabel, QComboBox, QTimeEdit, QSpinBox,
-                           QCheckBox, QGroupBox, QRadioButton, QButtonGroup)
+                           QCheckBox, QGroupBox, QRadioButton, QButtonGroup, QProgressBar)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QTime
 from PyQt5.QtGui import QIcon, QPixmap
 import pyqtgraph as pg
@@ -13,36 +14,151 @@ from datetime import datetime
 
 from ..core.organizer import SmartOrganizer
 from ..core.scheduler import ScheduleManager
+from ..core.move_journal import MoveJournal
+from ..core.runner import FolderLock
+from ..core.progress import format_progress, SCAN_STAGE, MOVE_STAGE
+from .plan_preview import PlanPreviewDialog
 from ..utils.analytics import Analytics
 
+# Progress updates per second sent from worker threads to the UI
+UI_REFRESH_HZ = 10
+
 class OrganizeThread(QThread):
     update_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(object)
     finished_signal = pyqtSignal(dict)
     
     def __init__(self, source_folder, destination_folder=None, organization_mode="type",
-                 preserve_structure=True, include_subfolders=False):
+                 preserve_structure=True, include_subfolders=False, plan=None, resume_run_id=None):
         super().__init__()
         self.source_folder = source_folder
         self.destination_folder = destination_folder
         self.organization_mode = organization_mode
         self.preserve_structure = preserve_structure
         self.include_subfolders = include_subfolders
+        self.plan = plan
+        self.resume_run_id = resume_run_id
+        self.cancel_event = threading.Event()
+    
+    def cancel(self):
+        """Ask the run to stop after the files in flight"""
+        self.cancel_event.set()
     
     def run(self):
+        lock = None
+        organizer = None
         try:
             organizer = SmartOrganizer()
+            folder = self.source_folder
+            if self.resume_run_id:
+                folder = organizer.journal.get_run(self.resume_run_id)['source_folder']
+            
+            # Don't overlap a scheduled or watch run of the same folder
+            lock = FolderLock(folder)
+            if not lock.acquire():
+                lock = None
+                raise RuntimeError(f"{folder} is being organized by another run")
+            
+            if self.resume_run_id:
+                self.update_signal.emit("Resuming interrupted organization...")
+                stats = organizer.resume_run(
+                    self.resume_run_id,
+                    progress=self.progress_signal.emit,
+                    progress_interval=1.0 / UI_REFRESH_HZ,
+                    cancel=self.cancel_event
+                )
+                self.finished_signal.emit(stats)
+                return
+            
             self.update_signal.emit(f"Starting organization by {self.organization_mode}...")
             stats = organizer.organize_folder(
                 self.source_folder, 
                 self.destination_folder,
                 organization_mode=self.organization_mode,
                 preserve_structure=self.preserve_structure,
-                include_subfolders=self.include_subfolders
+                include_subfolders=self.include_subfolders,
+                plan=self.plan,
+                progress=self.progress_signal.emit,
+                progress_interval=1.0 / UI_REFRESH_HZ,
+                cancel=self.cancel_event
             )
             self.finished_signal.emit(stats)
         except Exception as e:
             self.update_signal.emit(f"Error: {str(e)}")
             self.finished_signal.emit({"error": str(e)})
+        finally:
+            if organizer is not None:
+                organizer.close()
+            if lock is not None:
+                lock.release()
+
+class UndoThread(QThread):
+    update_signal = pyqtSignal(str)
+    finished_signal = pyqtSignal(dict)
+    
+    def __init__(self, db_path, run_id):
+        super().__init__()
+        self.db_path = db_path
+        self.run_id = run_id
+    
+    def run(self):
+        # The journal's connection belongs to the thread that opens it
+        journal = MoveJournal(self.db_path)
+        lock = None
+        try:
+            folder = journal.get_run(self.run_id)['source_folder']
+            lock = FolderLock(folder)
+            if not lock.acquire():
+                lock = None
+                raise RuntimeError(f"{folder} is being organized by another run")
+            
+            self.update_signal.emit("Undoing the last organize run...")
+            stats = journal.undo_run(self.run_id)
+            self.finished_signal.emit(stats)
+        except Exception as e:
+            self.update_signal.emit(f"Error: {str(e)}")
+            self.finished_signal.emit({"error": str(e)})
+        finally:
+            if lock is not None:
+                lock.release()
+            journal.close()
+
+class PlanThread(QThread):
+    update_signal = pyqtSignal(str)
+    progress_signal = pyqtSignal(object)
+    finished_signal = pyqtSignal(object)
+    
+    def __init__(self, source_folder, destination_folder=None, organization_mode="type",
+                 preserve_structure=True, include_subfolders=False):
+        super().__init__()
+        self.source_folder = source_folder
+        self.destination_folder = destination_folder
+        self.organization_mode = organization_mode
+        self.preserve_structure = preserve_structure
+        self.include_subfolders = include_subfolders
+    
+    def run(self):
+        organizer = None
+        try:
+            organizer = SmartOrganizer()
+            self.update_signal.emit(f"Planning organization by {self.organization_mode}...")
+            plan = organizer.plan_organization(
+                self.source_folder,
+                self.destination_folder,
+                organization_mode=self.organization_mode,
+                preserve_structure=self.preserve_structure,
+                include_subfolders=self.include_subfolders,
+                progress=self.progress_signal.emit,
+                progress_interval=1.0 / UI_REFRESH_HZ
+            )
+            self.update_signal.emit(f"Planned {len(plan)} files")
+            self.finished_signal.emit(plan)
+        except Exception as e:
+            self.update_signal.emit(f"Error: {str(e)}")
+            self.finished_signal.emit(None)
+        finally:
+            if organizer is not None:
+                organizer.close()
 
 class FileOrganizerGUI(QMainWindow):
     def __init__(self):
@@ -209,6 +325,35 @@ class FileOrganizerGUI(QMainWindow):
         self.organize_btn.setEnabled(False)
         layout.addWidget(self.organize_btn)
         
+        # Preview button
+        self.preview_btn = QPushButton("Preview")
+        self.preview_btn.clicked.connect(self.preview_organization)
+        self.preview_btn.setEnabled(False)
+        layout.addWidget(self.preview_btn)
+        
+        # Cancel button, enabled while organizing
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.cancel_organize)
+        self.cancel_btn.setEnabled(False)
+        layout.addWidget(self.cancel_btn)
+        
+        # Resume button
+        self.resume_btn = QPushButton("Resume Interrupted Run")
+        self.resume_btn.clicked.connect(self.resume_interrupted_run)
+        layout.addWidget(self.resume_btn)
+        
+        # Undo button
+        self.undo_btn = QPushButton("Undo Last Run")
+        self.undo_btn.clicked.connect(self.undo_last_run)
+        layout.addWidget(self.undo_btn)
+        
+        # Live progress of the running organize
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        self.progress_label = QLabel("")
+        layout.addWidget(self.progress_label)
+        
         # Progress display
         self.progress_text = QTextEdit()
         self.progress_text.setReadOnly(True)
@@ -236,7 +381,7 @@ class FileOrganizerGUI(QMainWindow):
         self.schedule_folder_btn.clicked.connect(self.select_schedule_folder)
         
         self.schedule_type = QComboBox()
-        self.schedule_type.addItems(["Daily", "Weekly", "Hourly", "Every X Minutes"])
+        self.schedule_type.addItems(["Daily", "Weekly", "Hourly", "Every X Minutes", "Watch Folder"])
         self.schedule_type.currentTextChanged.connect(self.on_schedule_type_changed)
         
         self.schedule_time = QTimeEdit()
@@ -396,6 +541,7 @@ class FileOrganizerGUI(QMainWindow):
             self.source_label.setText(f"Source Folder: {folder}")
             self.source_folder = folder
             self.organize_btn.setEnabled(True)
+            self.preview_btn.setEnabled(True)
             
     def select_destination_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select Destination Folder")
@@ -406,13 +552,8 @@ class FileOrganizerGUI(QMainWindow):
             self.dest_label.setText("Destination: Same as source")
             self.destination_folder = None
             
-    def organize_files(self):
-        if not hasattr(self, 'source_folder'):
-            return
-            
-        self.organize_btn.setEnabled(False)
-        self.progress_text.clear()
-        
+    def _organize_options(self):
+        """Organization mode and options selected in the Organize tab"""
         # Get selected organization method
         method_id = self.method_group.checkedId()
         organization_modes = ["type", "date", "size", "ai"]
@@ -421,26 +562,124 @@ class FileOrganizerGUI(QMainWindow):
         # Get options
         preserve_structure = self.preserve_structure.isChecked()
         include_subfolders = self.include_subfolders.isChecked()
+        return organization_mode, preserve_structure, include_subfolders
+    
+    def organize_files(self):
+        if not hasattr(self, 'source_folder'):
+            return
+        self.progress_text.clear()
+        self._start_organize()
+    
+    def _start_organize(self, plan=None, resume_run_id=None):
+        self.organize_btn.setEnabled(False)
+        self.preview_btn.setEnabled(False)
+        self.resume_btn.setEnabled(False)
+        self.cancel_btn.setEnabled(True)
+        organization_mode, preserve_structure, include_subfolders = self._organize_options()
         
         # Start organization in a separate thread
         self.organize_thread = OrganizeThread(
-            self.source_folder,
+            getattr(self, 'source_folder', None),
             getattr(self, 'destination_folder', None),
             organization_mode,
             preserve_structure,
-            include_subfolders
+            include_subfolders,
+            plan,
+            resume_run_id
         )
         self.organize_thread.update_signal.connect(self.update_progress)
+        self.organize_thread.progress_signal.connect(self.show_progress)
         self.organize_thread.finished_signal.connect(self.organization_finished)
         self.organize_thread.start()
+    
+    def preview_organization(self):
+        if not hasattr(self, 'source_folder'):
+            return
+            
+        self.organize_btn.setEnabled(False)
+        self.preview_btn.setEnabled(False)
+        self.progress_text.clear()
+        organization_mode, preserve_structure, include_subfolders = self._organize_options()
+        
+        # Plan in a separate thread, then show the preview
+        self.plan_thread = PlanThread(
+            self.source_folder,
+            getattr(self, 'destination_folder', None),
+            organization_mode,
+            preserve_structure,
+            include_subfolders
+        )
+        self.plan_thread.update_signal.connect(self.update_progress)
+        self.plan_thread.progress_signal.connect(self.show_progress)
+        self.plan_thread.finished_signal.connect(self.plan_ready)
+        self.plan_thread.start()
+    
+    def plan_ready(self, plan):
+        self.organize_btn.setEnabled(True)
+        self.preview_btn.setEnabled(True)
+        self.progress_bar.setVisible(False)
+        if plan is None:
+            return
+        
+        dialog = PlanPreviewDialog(plan, self)
+        if dialog.exec_() == PlanPreviewDialog.Accepted:
+            self._start_organize(plan)
         
     def update_progress(self, message):
         self.progress_text.append(f"{datetime.now().strftime('%H:%M:%S')}: {message}")
+    
+    def show_progress(self, event):
+        """Show a ProgressEvent in the progress bar and label"""
+        self.progress_bar.setVisible(True)
+        if event.stage == SCAN_STAGE:
+            # Total unknown while scanning: busy indicator
+            self.progress_bar.setRange(0, 0)
+        elif event.stage == MOVE_STAGE and event.bytes_total:
+            self.progress_bar.setRange(0, 1000)
+            self.progress_bar.setValue(int(1000 * event.bytes_done / event.bytes_total))
+        elif event.stage == MOVE_STAGE:
+            self.progress_bar.setRange(0, max(event.files_total, 1))
+            self.progress_bar.setValue(event.files_done)
+        else:
+            self.progress_bar.setRange(0, max(event.files_scanned, 1))
+            self.progress_bar.setValue(event.files_planned)
+        self.progress_label.setText(format_progress(event))
+        
+    def cancel_organize(self):
+        if getattr(self, 'organize_thread', None) is not None and self.organize_thread.isRunning():
+            self.cancel_btn.setEnabled(False)
+            self.update_progress("Cancelling after the files in progress...")
+            self.organize_thread.cancel()
+    
+    def resume_interrupted_run(self):
+        journal = MoveJournal(self.analytics.db_path)
+        run_id = journal.resumable_run()
+        run = journal.get_run(run_id) if run_id else None
+        journal.close()
+        if run is None:
+            QMessageBox.information(self, "Resume", "There is no interrupted organize run")
+            return
         
+        reply = QMessageBox.question(self, "Resume",
+            f"Finish organizing {run['source_folder']} (started {run['started']}, "
+            f"last checkpoint {run['checkpoint'] or 'none'})?",
+            QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.progress_text.clear()
+            self._start_organize(resume_run_id=run_id)
+    
     def organization_finished(self, stats):
-        self.organize_btn.setEnabled(True)
+        self.organize_btn.setEnabled(hasattr(self, 'source_folder'))
+        self.preview_btn.setEnabled(hasattr(self, 'source_folder'))
+        self.resume_btn.setEnabled(True)
+        self.cancel_btn.setEnabled(False)
+        self.progress_bar.setVisible(False)
         if "error" in stats:
             QMessageBox.critical(self, "Error", f"Organization failed: {stats['error']}")
+        elif stats.get("cancelled"):
+            QMessageBox.information(self, "Cancelled",
+                f"Organization cancelled after moving {stats.get('moved', 0)} files.\n"
+                f"Use \"Resume Interrupted Run\" to finish it.")
         else:
             QMessageBox.information(self, "Success", 
                 f"Organization complete!\n"
@@ -450,6 +689,37 @@ class FileOrganizerGUI(QMainWindow):
                 f"Errors: {stats.get('errors', 0)}")
         self.refresh_analytics()
         
+    def undo_last_run(self):
+        journal = MoveJournal(self.analytics.db_path)
+        run_id = journal.latest_run()
+        if run_id is None:
+            QMessageBox.information(self, "Undo", "There is no organize run to undo")
+            journal.close()
+            return
+        
+        reply = QMessageBox.question(self, "Undo",
+            "Move the files of the last organize run back to their original locations?",
+            QMessageBox.Yes | QMessageBox.No)
+        journal.close()
+        if reply != QMessageBox.Yes:
+            return
+        
+        # Restoring many files takes a while; keep the UI responsive
+        self.undo_btn.setEnabled(False)
+        self.undo_thread = UndoThread(self.analytics.db_path, run_id)
+        self.undo_thread.update_signal.connect(self.update_progress)
+        self.undo_thread.finished_signal.connect(self.undo_finished)
+        self.undo_thread.start()
+    
+    def undo_finished(self, stats):
+        self.undo_btn.setEnabled(True)
+        if "error" in stats:
+            QMessageBox.critical(self, "Error", f"Undo failed: {stats['error']}")
+        else:
+            self.update_progress(f"Undo complete: {stats['restored']} files restored, "
+                                 f"{stats['errors']} errors")
+        self.refresh_analytics()
+        
     def select_schedule_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "Select Folder to Schedule")
         if folder:
@@ -478,6 +748,9 @@ class FileOrganizerGUI(QMainWindow):
         elif schedule_type == "every x minutes":
             time_value = str(self.schedule_minutes.value())
             schedule_type = "minutes"
+        elif schedule_type == "watch folder":
+            time_value = None
+            schedule_type = "watch"
         else:
             time_value = None
             
@@ -596,17 +869,19 @@ class FileOrganizerGUI(QMainWindow):
                 extensions_list = [ext.strip() for ext in extensions.split(',')]
                 mappings[category] = extensions_list
             
-            # Create config
-            config = {
-                "folders": mappings,
-                "rules": {
-                    "use_ai_classification": self.enable_ai_features.isChecked(),
-                    "cluster_similar_files": self.enable_clustering.isChecked(),
-                    "min_duplicate_similarity": self.similarity_threshold.value() / 100.0,
-                    "preserve_folder_structure": True,
-                    "organization_mode": "type"
-                }
-            }
+            # Update config, keeping sections not edited here (e.g. custom_rules)
+            config = {}
+            if os.path.exists("config.json"):
+                with open("config.json", "r") as f:
+                    config = json.load(f)
+            config["folders"] = mappings
+            config.setdefault("rules", {}).update({
+                "use_ai_classification": self.enable_ai_features.isChecked(),
+                "cluster_similar_files": self.enable_clustering.isChecked(),
+                "min_duplicate_similarity": self.similarity_threshold.value() / 100.0,
+                "preserve_folder_structure": True,
+                "organization_mode": "type"
+            })
             
             # Save to file
             with open("config.json", "w") as f:
@@ -617,5 +892,11 @@ class FileOrganizerGUI(QMainWindow):
             QMessageBox.critical(self, "Error", f"Failed to save settings: {str(e)}")
         
     def closeEvent(self, event):
+        # Let a running organize stop at a checkpoint so it can be resumed
+        if getattr(self, 'organize_thread', None) is not None and self.organize_thread.isRunning():
+            self.organize_thread.cancel()
+            self.organize_thread.wait()
+        if getattr(self, 'undo_thread', None) is not None:
+            self.undo_thread.wait()
         self.scheduler.stop()
         event.accept()
\ No newline at end of file
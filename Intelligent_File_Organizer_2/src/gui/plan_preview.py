@@ -0,0 +1,97 @@
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+                             QTableView, QHeaderView, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from ..core.plan import ACTIONS
+
+class PlanTableModel(QAbstractTableModel):
+    """Table model reading rows straight from an OrganizePlan.
+
+    Only the rows the view asks for are built, so a plan with millions of
+    rows opens as fast as a small one.
+    """
+
+    HEADERS = ("Source", "Destination", "Action", "Size (KB)")
+
+    def __init__(self, plan, parent=None):
+        super().__init__(parent)
+        self.plan = plan
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.plan)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        row, column = index.row(), index.column()
+        if column == 0:
+            return self.plan.sources[row]
+        if column == 1:
+            return self.plan.destination(row)
+        if column == 2:
+            return ACTIONS[self.plan.actions[row]]
+        size = self.plan.sizes[row]
+        return f"{size / 1024:.1f}" if size >= 0 else ""
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+class PlanPreviewDialog(QDialog):
+    """Preview of an organize plan; accepted when the user chooses to run it"""
+
+    def __init__(self, plan, parent=None):
+        super().__init__(parent)
+        self.plan = plan
+        self.setWindowTitle("Organization Preview")
+        self.resize(1000, 600)
+
+        layout = QVBoxLayout(self)
+
+        summary = plan.summary()
+        self.summary_label = QLabel(
+            f"{summary['move']['files']} files to move "
+            f"({summary['move']['bytes'] / (1024 * 1024):.1f} MB) into "
+            f"{len(plan.folders)} folders, "
+            f"{summary['preserve']['files']} preserved, {summary['error']['files']} errors"
+        )
+        layout.addWidget(self.summary_label)
+
+        self.table = QTableView()
+        self.table.setModel(PlanTableModel(plan, self))
+        # Fixed row heights keep scrolling cheap for very large plans
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 380)
+        self.table.setColumnWidth(1, 380)
+        self.table.setColumnWidth(2, 80)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        self.export_btn = QPushButton("Export CSV...")
+        self.export_btn.clicked.connect(self.export_plan)
+        self.run_btn = QPushButton("Organize")
+        self.run_btn.clicked.connect(self.accept)
+        self.run_btn.setEnabled(summary['move']['files'] > 0)
+        self.cancel_btn = QPushButton("Cancel")
+        self.cancel_btn.clicked.connect(self.reject)
+        buttons.addWidget(self.export_btn)
+        buttons.addStretch()
+        buttons.addWidget(self.run_btn)
+        buttons.addWidget(self.cancel_btn)
+        layout.addLayout(buttons)
+
+    def export_plan(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Plan", "organize_plan.csv", "CSV Files (*.csv)")
+        if not path:
+            return
+        try:
+            self.plan.export_csv(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Could not export plan: {e}")
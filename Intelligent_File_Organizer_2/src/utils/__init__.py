@@ -1,4 +1,11 @@
 from .file_utils import get_file_info, generate_hash
 from .analytics import Analytics
+from .hash_index import HashIndex, get_hash_index
+from .scanner import scan_files, FileRecord, FileStat
+from .metrics import RunMetrics, write_prometheus_file
+from .hashing import hash_file, hash_files, available_backends
+from .devices import group_by_device, device_workers
 
-__all__ = ['get_file_info', 'generate_hash', 'Analytics']
\ No newline at end of file
+__all__ = ['get_file_info', 'generate_hash', 'Analytics', 'HashIndex', 'get_hash_index',
+           'scan_files', 'FileRecord', 'FileStat', 'RunMetrics', 'write_prometheus_file',
+           'hash_file', 'hash_files', 'available_backends', 'group_by_device', 'device_workers']
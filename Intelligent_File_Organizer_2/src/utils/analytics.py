@@ -2,72 +2,278 @@ import sqlite3
 import json
 from datetime import datetime, timedelta
 import os
+import time
+import atexit
+import threading
+import weakref
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Every live Analytics instance, so buffered rows can be flushed at exit
+_instances = weakref.WeakSet()
+
+def _flush_all():
+    """Flush all Analytics instances at interpreter exit"""
+    for analytics in list(_instances):
+        analytics.close()
+
+atexit.register(_flush_all)
+
+# Batches of rows kept in memory while writes fail
+MAX_PENDING_BATCHES = 10
 
 class Analytics:
-    def __init__(self, db_path="file_organizer.db"):
+    """Organization analytics stored in SQLite.
+    
+    Log rows are buffered and written with executemany in one transaction
+    per batch, when the buffer reaches batch_size or flush_interval seconds
+    passed since the last write. Buffered rows are also written by flush(),
+    before statistics are read, and at interpreter exit.
+    
+    A batch that cannot be written (e.g. "database is locked") stays
+    buffered and is retried with the next flush; at most
+    MAX_PENDING_BATCHES batches are kept, older rows are dropped.
+    
+    Each batch also updates organization_rollup, the file count, bytes and
+    latest timestamp per day and category, in the same transaction.
+    get_statistics reads only the rollup, so its cost does not grow with
+    the size of the log.
+    """
+    
+    def __init__(self, db_path="file_organizer.db", batch_size=1000, flush_interval=1.0):
         self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        # Buffer size that triggers a flush; raised while writes fail
+        self._flush_size = batch_size
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._conn = None
         self._init_db()
+        _instances.add(self)
+    
+    def _get_connection(self):
+        """Get the shared connection, opening it in WAL mode on first use"""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+        return self._conn
     
     def _init_db(self):
         """Initialize the analytics database"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS organization_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME,
-                file_path TEXT,
-                file_name TEXT,
-                file_size INTEGER,
-                original_location TEXT,
-                new_location TEXT,
-                category TEXT,
-                action TEXT
-            )
-        ''')
+        with self._lock:
+            conn = self._get_connection()
+            cursor = conn.cursor()
         
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS organization_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp DATETIME,
+                    file_path TEXT,
+                    file_name TEXT,
+                    file_size INTEGER,
+                    original_location TEXT,
+                    new_location TEXT,
+                    category TEXT,
+                    action TEXT
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_organization_log_timestamp ON organization_log (timestamp)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_organization_log_category ON organization_log (category)')
+            
+            # Built from the existing log the first time it is created; the
+            # write lock keeps two processes from both filling it
+            cursor.execute('BEGIN IMMEDIATE')
+            has_rollup = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'organization_rollup'"
+            ).fetchone()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS organization_rollup (
+                    day TEXT,
+                    category TEXT,
+                    files INTEGER,
+                    bytes INTEGER,
+                    last_timestamp DATETIME,
+                    PRIMARY KEY (day, category)
+                ) WITHOUT ROWID
+            ''')
+            if not has_rollup:
+                cursor.execute('''
+                    INSERT INTO organization_rollup (day, category, files, bytes, last_timestamp)
+                    SELECT coalesce(date(timestamp), ''), coalesce(category, ''), COUNT(*),
+                           coalesce(SUM(file_size), 0), MAX(timestamp)
+                    FROM organization_log
+                    GROUP BY 1, 2
+                ''')
+            
+            # One row per organize run with its timings as JSON
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    started DATETIME,
+                    finished DATETIME,
+                    source_folder TEXT,
+                    organization_mode TEXT,
+                    moved INTEGER,
+                    duplicates INTEGER,
+                    errors INTEGER,
+                    preserved INTEGER,
+                    bytes INTEGER,
+                    wall_seconds REAL,
+                    cpu_seconds REAL,
+                    metrics TEXT
+                )
+            ''')
+            
+            conn.commit()
     
-    def log_organization(self, file_info, category, action="organized"):
+    def log_organization(self, file_info, category, action="organized",
+                         original_location=None, new_location=None):
         """Log file organization event"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO organization_log 
-            (timestamp, file_path, file_name, file_size, category, action)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            datetime.now(),
+        row = (
+            datetime.now().isoformat(" "),
             file_info['path'],
             file_info['name'],
             file_info['size'],
+            original_location,
+            new_location,
             category,
             action
-        ))
+        )
         
-        conn.commit()
-        conn.close()
+        with self._lock:
+            self._buffer.append(row)
+            if (len(self._buffer) >= self._flush_size or
+                    time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+    
+    def flush(self):
+        """Write all buffered log rows"""
+        with self._lock:
+            self._flush_locked()
+    
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        rows, self._buffer = self._buffer, []
+        
+        # (day, category) -> [files, bytes, latest timestamp] of this batch
+        rollup = {}
+        for row in rows:
+            key = (row[0][:10], row[6] or "")
+            totals = rollup.get(key)
+            if totals is None:
+                rollup[key] = [1, row[3] or 0, row[0]]
+            else:
+                totals[0] += 1
+                totals[1] += row[3] or 0
+                totals[2] = max(totals[2], row[0])
+        
+        conn = self._get_connection()
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO organization_log 
+                    (timestamp, file_path, file_name, file_size, original_location,
+                     new_location, category, action)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                conn.executemany('''
+                    INSERT INTO organization_rollup (day, category, files, bytes, last_timestamp)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (day, category) DO UPDATE SET
+                        files = files + excluded.files,
+                        bytes = bytes + excluded.bytes,
+                        last_timestamp = max(last_timestamp, excluded.last_timestamp)
+                ''', [key + tuple(totals) for key, totals in rollup.items()])
+        except sqlite3.Error as e:
+            # Keep the rows for the next flush, after another batch arrived
+            # or flush_interval passed
+            limit = MAX_PENDING_BATCHES * self.batch_size
+            rows.extend(self._buffer)
+            if len(rows) > limit:
+                logger.error(f"Dropping {len(rows) - limit} analytics rows that could not be written")
+                rows = rows[-limit:]
+            self._buffer = rows
+            self._flush_size = len(rows) + self.batch_size
+            logger.warning(f"Could not write {len(rows)} analytics rows, will retry: {e}")
+            return
+        self._flush_size = self.batch_size
+    
+    def log_run(self, run_id, started, source_folder, organization_mode, stats, metrics):
+        """Store the statistics and metrics dict of a finished organize run"""
+        moved_bytes = sum(mode["bytes"] for mode in stats.get("throughput", {}).values())
+        row = (
+            run_id,
+            datetime.fromtimestamp(started).isoformat(" "),
+            datetime.now().isoformat(" "),
+            source_folder,
+            organization_mode,
+            stats.get("moved", 0),
+            stats.get("duplicates", 0),
+            stats.get("errors", 0),
+            stats.get("preserved", 0),
+            moved_bytes,
+            metrics["wall_seconds"],
+            metrics["cpu_seconds"],
+            json.dumps(metrics)
+        )
+        with self._lock:
+            conn = self._get_connection()
+            try:
+                with conn:
+                    conn.execute('''
+                        INSERT OR REPLACE INTO runs
+                        (run_id, started, finished, source_folder, organization_mode, moved,
+                         duplicates, errors, preserved, bytes, wall_seconds, cpu_seconds, metrics)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', row)
+            except sqlite3.Error as e:
+                logger.error(f"Could not write metrics of run {run_id}: {e}")
+    
+    def get_runs(self, limit=20):
+        """Latest organize runs with their metrics, newest first"""
+        with self._lock:
+            cursor = self._get_connection().execute('''
+                SELECT run_id, started, finished, source_folder, organization_mode, moved,
+                       duplicates, errors, preserved, bytes, wall_seconds, cpu_seconds, metrics
+                FROM runs ORDER BY started DESC LIMIT ?
+            ''', (limit,))
+            columns = [column[0] for column in cursor.description]
+            runs = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        for run in runs:
+            run["metrics"] = json.loads(run["metrics"]) if run["metrics"] else {}
+        return runs
+    
+    def close(self):
+        """Flush buffered rows and close the connection"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush_locked()
+            if self._buffer:
+                logger.error(f"Closing with {len(self._buffer)} analytics rows not written")
+            self._conn.close()
+            self._conn = None
     
     def get_statistics(self):
-        """Get comprehensive statistics"""
+        """Get comprehensive statistics from the rollup table"""
+        self.flush()
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        # Total files organized
-        cursor.execute('SELECT COUNT(*) FROM organization_log')
-        total_files = cursor.fetchone()[0]
-        
-        # Total size
-        cursor.execute('SELECT SUM(file_size) FROM organization_log')
-        total_size = cursor.fetchone()[0] or 0
+        # Total files and size
+        cursor.execute('SELECT SUM(files), SUM(bytes), MAX(last_timestamp) FROM organization_rollup')
+        total_files, total_size, last_run = cursor.fetchone()
         
         # By category
         cursor.execute('''
-            SELECT category, COUNT(*), SUM(file_size)
-            FROM organization_log
+            SELECT category, SUM(files), SUM(bytes)
+            FROM organization_rollup
             GROUP BY category
         ''')
         by_category = {}
@@ -79,26 +285,22 @@ class Analytics:
         
         # Timeline (last 30 days)
         cursor.execute('''
-            SELECT date(timestamp), COUNT(*)
-            FROM organization_log
-            WHERE timestamp > datetime('now', '-30 days')
-            GROUP BY date(timestamp)
-            ORDER BY date(timestamp)
+            SELECT day, SUM(files)
+            FROM organization_rollup
+            WHERE day >= date('now', '-30 days')
+            GROUP BY day
+            ORDER BY day
         ''')
         timeline = {}
         for date, count in cursor.fetchall():
             timeline[date] = count
         
-        # Last run
-        cursor.execute('SELECT MAX(timestamp) FROM organization_log')
-        last_run = cursor.fetchone()[0]
-        
         conn.close()
         
         return {
-            'total_files': total_files,
-            'total_size': total_size,
+            'total_files': total_files or 0,
+            'total_size': total_size or 0,
             'by_category': by_category,
             'timeline': timeline,
             'last_run': last_run
-        }
\ No newline at end of file
+        }
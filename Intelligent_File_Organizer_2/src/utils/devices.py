@@ -0,0 +1,82 @@
+import os
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Concurrent file operations per device, by device kind
+DEFAULT_DEVICE_WORKERS = {"rotational": 1, "ssd": 4, "unknown": 2}
+
+# st_dev -> rotational flag, looked up once per device
+_rotational = {}
+
+
+def device_of(path):
+    """st_dev of the filesystem path is on"""
+    return os.stat(path).st_dev
+
+
+def group_by_device(folders):
+    """Map st_dev to the folders on that device, in the given order.
+
+    Folders that cannot be read are left out and logged.
+    """
+    groups = {}
+    for folder in folders:
+        try:
+            groups.setdefault(device_of(folder), []).append(folder)
+        except OSError as e:
+            logger.error(f"Cannot read {folder}: {e}")
+    return groups
+
+
+def is_rotational(device):
+    """True for a spinning disk, False for an SSD, None if unknown.
+
+    Read from sysfs on Linux; other platforms and virtual filesystems are
+    unknown.
+    """
+    if device in _rotational:
+        return _rotational[device]
+    rotational = None
+    if sys.platform.startswith("linux"):
+        block = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+        # A partition has no queue of its own; its disk is the parent
+        for queue in (os.path.join(block, "queue"), os.path.join(block, "..", "queue")):
+            try:
+                with open(os.path.join(queue, "rotational")) as f:
+                    rotational = f.read().strip() == "1"
+                break
+            except OSError:
+                continue
+    _rotational[device] = rotational
+    return rotational
+
+
+def device_kind(device):
+    """"rotational", "ssd" or "unknown" """
+    rotational = is_rotational(device)
+    if rotational is None:
+        return "unknown"
+    return "rotational" if rotational else "ssd"
+
+
+def device_workers(device, budgets=None):
+    """Concurrent file operations allowed on a device.
+
+    budgets maps a device kind to a worker count, as in
+    DEFAULT_DEVICE_WORKERS, or any path on a device (a mount point, say)
+    to the count for that device.
+    """
+    budgets = dict(DEFAULT_DEVICE_WORKERS, **(budgets or {}))
+    workers = budgets[device_kind(device)]
+    for key, value in budgets.items():
+        if key in DEFAULT_DEVICE_WORKERS:
+            continue
+        try:
+            if device_of(key) == device:
+                workers = value
+                break
+        except OSError:
+            continue
+    return max(1, int(workers))
@@ -1,11 +1,11 @@
 import os
-import hashlib
 from datetime import datetime
 import mimetypes
+from .hashing import hash_file, hash_partial
 
-def get_file_info(file_path):
-    """Get comprehensive file information"""
-    stat = os.stat(file_path)
+def get_file_info(file_path, stat_result=None):
+    """Get comprehensive file information, from stat_result if given"""
+    stat = stat_result or os.stat(file_path)
     
     return {
         'path': file_path,
@@ -17,15 +17,14 @@ def get_file_info(file_path):
         'mime_type': mimetypes.guess_type(file_path)[0]
     }
 
-def generate_hash(file_path, algorithm='md5'):
-    """Generate file hash for duplicate detection"""
-    hash_algo = hashlib.new(algorithm)
-    
-    with open(file_path, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_algo.update(chunk)
-    
-    return hash_algo.hexdigest()
+def generate_hash(file_path, algorithm=None):
+    """Generate file hash for duplicate detection (default: the configured
+    algorithm, see hashing.set_default_algorithm)"""
+    return hash_file(file_path, algorithm)
+
+def generate_partial_hash(file_path, block_size=65536, algorithm=None):
+    """Hash the first and last block_size bytes of a file"""
+    return hash_partial(file_path, block_size, algorithm)
 
 def format_size(size_bytes):
     """Format file size in human-readable format"""
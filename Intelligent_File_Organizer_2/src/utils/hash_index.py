@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import threading
+import atexit
+import logging
+from .file_utils import generate_hash
+from .hashing import get_default_algorithm
+
+logger = logging.getLogger(__name__)
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_hash_index(db_path="file_organizer.db"):
+    """Get the process-wide HashIndex for a database"""
+    key = (os.getpid(), os.path.abspath(db_path))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = HashIndex(db_path)
+            _indexes[key] = index
+            atexit.register(index.close)
+        return index
+
+
+class HashIndex:
+    """Persistent content-hash index keyed by (device, inode, size, mtime).
+
+    A stored digest is reused as long as the file's identity and size/mtime
+    are unchanged, so renames and moves on the same filesystem keep their
+    entry and only new or modified files are read.
+    """
+
+    def __init__(self, db_path="file_organizer.db", batch_size=256):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self.hashed_bytes = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the hash index table"""
+        cursor = self._conn.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS file_hashes (
+                device INTEGER,
+                inode INTEGER,
+                algorithm TEXT,
+                size INTEGER,
+                mtime_ns INTEGER,
+                digest TEXT,
+                path TEXT,
+                PRIMARY KEY (device, inode, algorithm)
+            )
+        ''')
+        self._conn.commit()
+
+    def get_hash(self, file_path, algorithm=None, stat_result=None):
+        """Return the file digest, reading the file only if it changed"""
+        algorithm = algorithm or get_default_algorithm()
+        st = stat_result or os.stat(file_path)
+        digest = self.lookup(st, algorithm)
+        if digest is not None:
+            return digest
+
+        digest = generate_hash(file_path, algorithm)
+        with self._lock:
+            self.hashed_bytes += st.st_size
+        self.store(file_path, st, algorithm, digest)
+        return digest
+
+    def lookup(self, stat_result, algorithm=None):
+        """Return the stored digest for an unchanged file, or None"""
+        algorithm = algorithm or get_default_algorithm()
+        st = stat_result
+        key = (st.st_dev, st.st_ino, algorithm)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending and pending[3:5] == (st.st_size, st.st_mtime_ns):
+                self.hits += 1
+                return pending[5]
+
+            row = self._conn.execute('''
+                SELECT digest FROM file_hashes
+                WHERE device = ? AND inode = ? AND algorithm = ?
+                AND size = ? AND mtime_ns = ?
+            ''', (st.st_dev, st.st_ino, algorithm, st.st_size, st.st_mtime_ns)).fetchone()
+            if row:
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def store(self, file_path, stat_result, algorithm, digest):
+        """Queue a digest to be written with the next batch"""
+        st = stat_result
+        with self._lock:
+            self._pending[(st.st_dev, st.st_ino, algorithm)] = (
+                st.st_dev, st.st_ino, algorithm, st.st_size, st.st_mtime_ns, digest, file_path
+            )
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def flush(self):
+        """Write queued digests to the database"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        try:
+            self._conn.executemany('''
+                INSERT OR REPLACE INTO file_hashes
+                (device, inode, algorithm, size, mtime_ns, digest, path)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', list(self._pending.values()))
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write hash index: {e}")
+        self._pending = {}
+
+    def close(self):
+        """Flush and close the database connection"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush_locked()
+            self._conn.close()
+            self._conn = None
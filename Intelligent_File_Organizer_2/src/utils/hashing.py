@@ -0,0 +1,159 @@
+import os
+import mmap
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Try to import the fast non-cryptographic and tree hashes
+XXHASH_SUPPORT = False
+try:
+    import xxhash
+    XXHASH_SUPPORT = True
+except ImportError:
+    xxhash = None
+
+BLAKE3_SUPPORT = False
+try:
+    import blake3
+    BLAKE3_SUPPORT = True
+except ImportError:
+    blake3 = None
+
+# Size of the per-thread read buffer
+BUFFER_SIZE = 1024 * 1024
+# Files at least this large are hashed from a memory map
+MMAP_THRESHOLD = 16 * 1024 * 1024
+# Bytes passed to one update() call when hashing a memory map
+MMAP_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Name -> factory returning a new hash object with update() and hexdigest()
+_backends = {}
+_default_algorithm = "md5"
+_local = threading.local()
+
+
+def register_backend(name, factory):
+    """Make a hash backend available under name"""
+    _backends[name] = factory
+
+
+for _name in ("md5", "sha1", "sha256", "blake2b"):
+    register_backend(_name, getattr(hashlib, _name))
+
+if XXHASH_SUPPORT:
+    for _name in ("xxh64", "xxh3_64", "xxh3_128"):
+        register_backend(_name, getattr(xxhash, _name))
+
+if BLAKE3_SUPPORT:
+    # One thread per hash; files are spread over threads instead
+    register_backend("blake3", lambda: blake3.blake3(max_threads=1))
+
+
+def available_backends():
+    """Names of the registered hash backends"""
+    return list(_backends)
+
+
+def get_default_algorithm():
+    return _default_algorithm
+
+
+def set_default_algorithm(name):
+    """Set the algorithm used when none is given, e.g. from config"""
+    global _default_algorithm
+    if name not in _backends:
+        raise ValueError(f"Unknown hash algorithm: {name} (available: {', '.join(_backends)})")
+    _default_algorithm = name
+
+
+def new_hasher(algorithm=None):
+    """New hash object for algorithm (default: the configured one)"""
+    algorithm = algorithm or _default_algorithm
+    factory = _backends.get(algorithm)
+    if factory is not None:
+        return factory()
+    # Any other hashlib algorithm still works, as generate_hash allowed before
+    return hashlib.new(algorithm)
+
+
+def _buffer():
+    """Read buffer of the calling thread, reused across files"""
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = bytearray(BUFFER_SIZE)
+    return buffer
+
+
+def _update_from(hasher, f, count=None):
+    """Feed up to count bytes (default: the rest) of f to hasher"""
+    buffer = _buffer()
+    view = memoryview(buffer)
+    remaining = count
+    while remaining is None or remaining > 0:
+        if remaining is not None and remaining < len(buffer):
+            read = f.readinto(view[:remaining])
+        else:
+            read = f.readinto(buffer)
+        if not read:
+            break
+        # The hash functions release the GIL for large updates
+        hasher.update(view[:read])
+        if remaining is not None:
+            remaining -= read
+
+
+def hash_file(file_path, algorithm=None, use_mmap=None):
+    """Hex digest of a whole file.
+
+    Large files are hashed from a memory map, others through a read buffer
+    reused by the calling thread. use_mmap forces either path.
+    """
+    hasher = new_hasher(algorithm)
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if use_mmap is None:
+            use_mmap = size >= MMAP_THRESHOLD
+        # Empty files cannot be mapped
+        if use_mmap and size:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, len(mapped), MMAP_CHUNK_SIZE):
+                        hasher.update(view[offset:offset + MMAP_CHUNK_SIZE])
+                finally:
+                    view.release()
+        else:
+            _update_from(hasher, f)
+    return hasher.hexdigest()
+
+
+def hash_partial(file_path, block_size=65536, algorithm=None):
+    """Hex digest of the first and last block_size bytes of a file"""
+    hasher = new_hasher(algorithm)
+    with open(file_path, 'rb') as f:
+        _update_from(hasher, f, block_size)
+        size = os.fstat(f.fileno()).st_size
+        if size > block_size:
+            f.seek(max(block_size, size - block_size))
+            _update_from(hasher, f, block_size)
+    return hasher.hexdigest()
+
+
+def hash_files(file_paths, algorithm=None, workers=4):
+    """Hash files on a thread pool; returns digests in input order, None
+    for files that could not be read"""
+    def safe_hash(file_path):
+        try:
+            return hash_file(file_path, algorithm)
+        except OSError as e:
+            logger.error(f"Error hashing {file_path}: {e}")
+            return None
+
+    file_paths = list(file_paths)
+    if workers <= 1 or len(file_paths) < 2:
+        return [safe_hash(file_path) for file_path in file_paths]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(safe_hash, file_paths))
@@ -0,0 +1,201 @@
+import os
+import time
+import hashlib
+from bisect import bisect_left
+from contextlib import contextmanager
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0)
+
+
+class Histogram:
+    """Latency histogram with fixed bucket bounds"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One count per bucket plus the overflow (+Inf) bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {"buckets": list(self.buckets), "counts": list(self.counts),
+                "sum": self.sum, "count": self.count}
+
+
+class RunMetrics:
+    """Timers, byte counters and latency histograms of one organize run.
+
+    Each stage accumulates wall time, CPU time (process CPU time, so work
+    on worker threads in the same process is included), the number of
+    timed calls and the bytes it handled.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.histograms = {}
+        self.counters = {}
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+    def _stage(self, name):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0, "bytes": 0}
+        return stage
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block as part of a stage"""
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            stage = self._stage(name)
+            stage["wall_seconds"] += time.perf_counter() - wall
+            stage["cpu_seconds"] += time.process_time() - cpu
+            stage["calls"] += 1
+
+    def add_time(self, name, wall_seconds, cpu_seconds=0.0, calls=1):
+        """Add time measured outside a stage() block"""
+        stage = self._stage(name)
+        stage["wall_seconds"] += wall_seconds
+        stage["cpu_seconds"] += cpu_seconds
+        stage["calls"] += calls
+
+    def add_bytes(self, name, count):
+        """Add bytes handled by a stage"""
+        self._stage(name)["bytes"] += count
+
+    def observe(self, name, seconds):
+        """Record one latency sample"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    def count(self, name, value=1):
+        """Increase a counter"""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, other):
+        """Add the stages, counters, histograms and totals of another
+        finished RunMetrics, e.g. the planning half of a run"""
+        for name, stage in other.stages.items():
+            self.add_time(name, stage["wall_seconds"], stage["cpu_seconds"], stage["calls"])
+            self.add_bytes(name, stage["bytes"])
+        for name, value in other.counters.items():
+            self.count(name, value)
+        for name, histogram in other.histograms.items():
+            mine = self.histograms.get(name)
+            if mine is None:
+                mine = self.histograms[name] = Histogram(histogram.buckets)
+            mine.counts = [a + b for a, b in zip(mine.counts, histogram.counts)]
+            mine.sum += histogram.sum
+            mine.count += histogram.count
+        self.wall_seconds += other.wall_seconds
+        self.cpu_seconds += other.cpu_seconds
+
+    def finish(self):
+        """Add the wall and CPU time since this object was created to the
+        run totals; call once"""
+        self.wall_seconds += time.perf_counter() - self._wall_start
+        self.cpu_seconds += time.process_time() - self._cpu_start
+
+    def to_dict(self):
+        return {
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "stages": self.stages,
+            "counters": self.counters,
+            "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()}
+        }
+
+    def to_prometheus(self, labels=None, stats=None):
+        """Render the metrics in the Prometheus text exposition format"""
+        base = dict(labels or {})
+
+        def fmt(extra=None):
+            merged = dict(base, **(extra or {}))
+            if not merged:
+                return ""
+            pairs = ",".join(f'{key}="{_escape(value)}"' for key, value in merged.items())
+            return "{" + pairs + "}"
+
+        lines = [
+            "# HELP file_organizer_run_timestamp_seconds End time of the last organize run.",
+            "# TYPE file_organizer_run_timestamp_seconds gauge",
+            f"file_organizer_run_timestamp_seconds{fmt()} {time.time():.3f}",
+            "# HELP file_organizer_run_wall_seconds Wall time of the last organize run.",
+            "# TYPE file_organizer_run_wall_seconds gauge",
+            f"file_organizer_run_wall_seconds{fmt()} {self.wall_seconds:.6f}",
+            "# HELP file_organizer_run_cpu_seconds CPU time of the last organize run.",
+            "# TYPE file_organizer_run_cpu_seconds gauge",
+            f"file_organizer_run_cpu_seconds{fmt()} {self.cpu_seconds:.6f}",
+        ]
+
+        if stats:
+            lines += ["# HELP file_organizer_run_files Files of the last run by result.",
+                      "# TYPE file_organizer_run_files gauge"]
+            for status in ("moved", "duplicates", "errors", "preserved"):
+                lines.append(f"file_organizer_run_files{fmt({'status': status})} {stats.get(status, 0)}")
+
+        for metric, key, help_text in (
+            ("file_organizer_stage_wall_seconds", "wall_seconds", "Wall time per stage of the last run."),
+            ("file_organizer_stage_cpu_seconds", "cpu_seconds", "CPU time per stage of the last run."),
+            ("file_organizer_stage_bytes", "bytes", "Bytes handled per stage of the last run."),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+            for name, stage in self.stages.items():
+                value = stage[key]
+                lines.append(f"{metric}{fmt({'stage': name})} {value:.6f}" if isinstance(value, float)
+                             else f"{metric}{fmt({'stage': name})} {value}")
+
+        if self.counters:
+            lines += ["# HELP file_organizer_run_counter Counters of the last run.",
+                      "# TYPE file_organizer_run_counter gauge"]
+            for name, value in self.counters.items():
+                lines.append(f"file_organizer_run_counter{fmt({'name': name})} {value}")
+
+        if self.histograms:
+            metric = "file_organizer_latency_seconds"
+            lines += [f"# HELP {metric} Per-file latency by stage in the last run.",
+                      f"# TYPE {metric} histogram"]
+            for name, histogram in self.histograms.items():
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric}_bucket{fmt({'stage': name, 'le': le})} {cumulative}")
+                lines.append(f"{metric}_sum{fmt({'stage': name})} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{fmt({'stage': name})} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def write_prometheus_file(directory, folder, text):
+    """Atomically write a .prom file for a folder into a textfile collector
+    directory and return its path"""
+    os.makedirs(directory, exist_ok=True)
+    name = hashlib.sha1(os.path.abspath(folder).encode()).hexdigest()[:12]
+    path = os.path.join(directory, f"file_organizer_{name}.prom")
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+    return path
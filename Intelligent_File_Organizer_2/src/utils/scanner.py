@@ -0,0 +1,72 @@
+import os
+from collections import namedtuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class FileStat(namedtuple('FileStat', 'st_size st_mtime_ns st_ctime_ns st_dev st_ino')):
+    """The parts of an os.stat_result the organizer uses, in a compact tuple.
+
+    It can stand in for a stat result wherever only these fields and
+    st_mtime/st_ctime are read.
+    """
+    __slots__ = ()
+
+    @property
+    def st_mtime(self):
+        return self.st_mtime_ns / 1e9
+
+    @property
+    def st_ctime(self):
+        return self.st_ctime_ns / 1e9
+
+    @classmethod
+    def from_stat(cls, st):
+        return cls(st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_dev, st.st_ino)
+
+
+# A scanned file: its path, the folder relative to the scan root ("." for
+# the root itself) and its FileStat
+FileRecord = namedtuple('FileRecord', 'path relative_dir stat')
+
+
+def _entry_stat(entry):
+    """FileStat of a directory entry with a usable st_dev and st_ino"""
+    st = entry.stat()
+    if not st.st_ino or not st.st_dev:
+        st = os.stat(entry.path)
+    return FileStat.from_stat(st)
+
+
+def scan_files(root, include_subfolders=True):
+    """Yield a FileRecord for every regular file under root.
+
+    Built on os.scandir, so file types come from the directory listing and
+    each file is stat-ed once, by DirEntry.stat(). On Windows that stat is
+    free but has st_dev and st_ino set to 0, so those files are stat-ed
+    again with os.stat for a real device and file id. Consumers should
+    reuse record.stat instead of calling os.stat again. Unreadable folders
+    and files are logged and skipped.
+    """
+    pending = [(root, ".")]
+    while pending:
+        folder, relative_dir = pending.pop()
+        try:
+            with os.scandir(folder) as entries:
+                subfolders = []
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if include_subfolders:
+                                relative = entry.name if relative_dir == "." else os.path.join(relative_dir, entry.name)
+                                subfolders.append((entry.path, relative))
+                        elif entry.is_file():
+                            yield FileRecord(entry.path, relative_dir, _entry_stat(entry))
+                    except OSError as e:
+                        logger.error(f"Error reading {entry.path}: {e}")
+        except OSError as e:
+            logger.error(f"Error scanning {folder}: {e}")
+            continue
+        # Visit subfolders in listing order
+        pending.extend(reversed(subfolders))